@@ -0,0 +1,63 @@
+"""compares exporting pages one by one with HTMLobj.export against web.render_many
+and web.render_many_async over several worker counts, and what a page costs the
+parent process to ship : a pickle, an ArenaDocument or web.binary.dumps
+
+run with `python -m benchmarks.bench_batch` from the repository root
+"""
+
+import asyncio
+import pickle
+from os import cpu_count
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from web import render_many, render_many_async
+from web.abstractions.document import GetPage
+from web.binary import dumps
+from web.compact import ArenaDocument
+from web.html_ import HTMLobj
+
+
+def page(number: int) -> HTMLobj:
+    rows = [
+        HTMLobj("tr", None, "row", *(HTMLobj("td", None, None, f"{number}-{i}-{j}") for j in range(5)))
+        for i in range(200)
+    ]
+    return GetPage(HTMLobj("h1", None, None, f"Page {number}"), HTMLobj("table", None, None, *rows))
+
+
+def main(count: int = 400) -> None:
+    pages = {f"page{i}.html": page(i) for i in range(count)}
+    tree = pages["page0.html"]
+    shipped = {
+        "pickle": lambda tree: pickle.dumps(tree),
+        "arena": lambda tree: pickle.dumps(ArenaDocument(tree)),
+        "web.binary": dumps,
+    }
+    for name, ship in shipped.items():
+        start = perf_counter()
+        size = sum(len(ship(tree)) for tree in pages.values()) / count
+        print(f"{name:<11} {size / 1e3:7.1f} kB/page, {(perf_counter() - start) / count * 1e3:5.2f} ms/page in the parent")
+    with TemporaryDirectory() as out_dir:
+        start = perf_counter()
+        for name, tree in pages.items():
+            tree.export(f"{out_dir}/{name}")
+        serial = perf_counter() - start
+        print(f"export one by one          {serial:7.2f} s")
+        runs = {"render_many": lambda workers: render_many(pages, out_dir, workers=workers)}
+        runs["render_many_async"] = lambda workers: asyncio.run(render_many_async(pages, out_dir, workers))
+        for name, run in runs.items():
+            for workers in sorted({1, 2, 4, cpu_count()}):
+                if name == "render_many_async" and workers == 1:
+                    continue
+                start = perf_counter()
+                results = run(workers)
+                seconds = perf_counter() - start
+                slowest = max(results, key=lambda result: result.seconds)
+                print(
+                    f"{name} workers={workers:<2} {seconds:7.2f} s "
+                    f"({serial / seconds:.1f}x, slowest page {slowest.seconds * 1e3:.1f} ms)"
+                )
+
+
+if __name__ == "__main__":
+    main()
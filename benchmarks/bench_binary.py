@@ -0,0 +1,100 @@
+"""compares web.binary with pickle on a document of about 100k nodes : the encoded size,
+the dumps and loads times, and what a MappedDocument over a file saves when a cached
+page only has to be rendered or searched
+
+run with `python -m benchmarks.bench_binary` from the repository root
+"""
+
+import gc
+import os
+import pickle
+import tempfile
+from timeit import repeat
+from web.abstractions.document import GetPage
+from web.binary import MappedDocument, dumps, loads
+from web.css import CSSobj
+from web.html_ import HTMLobj
+
+
+def page(rows: int = 12_500) -> HTMLobj:
+    "8 nodes a row, texts, classes, attributes and inline styles as in a real report"
+    return GetPage(
+        HTMLobj(
+            "table",
+            None,
+            "orders",
+            *(
+                HTMLobj(
+                    "tr",
+                    None,
+                    "order",
+                    HTMLobj("td", None, None, f"order {i}"),
+                    HTMLobj("td", CSSobj(text_align="right", padding="2px 4px"), "total", f"{i * 1.25:.2f}"),
+                    HTMLobj(
+                        "td",
+                        None,
+                        "actions",
+                        HTMLobj("a", None, "button", "edit", href=f"/orders/{i}/edit"),
+                    ),
+                    id=f"order-{i}",
+                )
+                for i in range(rows)
+            ),
+        )
+    )
+
+
+def best(function, runs: int = 5) -> float:
+    gc.collect()
+    return min(repeat(function, number=1, repeat=runs))
+
+
+def main() -> None:
+    tree = page()
+    nodes = sum(1 for _ in _walk(tree))
+    pickled, encoded = pickle.dumps(tree, pickle.HIGHEST_PROTOCOL), dumps(tree)
+    assert str(loads(encoded)) == str(pickle.loads(pickled)) == str(tree)
+    print(f"{nodes:,} nodes, {len(str(tree)) / 1e6:.1f} MB of html\n")
+    print(f"{'':<14} {'pickle':>10} {'web.binary':>11}")
+    print(f"{'size':<14} {len(pickled) / 1e6:8.2f}MB {len(encoded) / 1e6:9.2f}MB")
+    times = {
+        "dumps": (best(lambda: pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)), best(lambda: dumps(tree))),
+        "loads": (best(lambda: pickle.loads(pickled)), best(lambda: loads(encoded))),
+    }
+    times["round trip"] = tuple(map(sum, zip(*times.values())))
+    for name, (old, new) in times.items():
+        print(f"{name:<14} {old * 1e3:8.1f}ms {new * 1e3:9.1f}ms {old / new:6.2f}x")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "page.webt")
+        with open(path, "wb") as f:
+            f.write(encoded)
+        print(f"\n{'from a file':<20} {'loads':>9} {'mapped':>9}")
+
+        def loaded(action):
+            with open(path, "rb") as f:
+                return action(loads(f.read()))
+
+        def mapped(action):
+            with MappedDocument.open(path) as document:
+                return action(document)
+
+        actions = {
+            "open and str()": str,
+            "find one row": lambda document: document.find("tr", "order", True, id="order-9000"),
+        }
+        for name, action in actions.items():
+            old, new = best(lambda: loaded(action)), best(lambda: mapped(action))
+            print(f"{name:<20} {old * 1e3:7.1f}ms {new * 1e3:7.1f}ms {old / new:6.2f}x")
+
+
+def _walk(tree: HTMLobj):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        if isinstance(node, HTMLobj):
+            stack.extend(node.contents or ())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""times building trees with add(), a chain of nested divs at growing depths and a
+wide list, alone and while another page keeps a tree index, then compact() of the
+chains. every step should cost the same at any depth, a growing time per node means
+a walk up the tree per node
+
+run with `python -m benchmarks.bench_build` from the repository root
+"""
+
+import gc
+from time import perf_counter
+from web.compact import compact
+from web.html_ import HTMLobj
+
+
+def chain(depth: int) -> HTMLobj:
+    root = node = HTMLobj("div")
+    for i in range(depth):
+        child = HTMLobj("div", None, None, f"level {i}")
+        node.add(child)
+        node = child
+    return root
+
+
+def wide(size: int) -> HTMLobj:
+    root = HTMLobj("ul")
+    for i in range(size):
+        root.add(HTMLobj("li", None, None, f"item {i}"))
+    return root
+
+
+def best(build, size: int, runs: int = 3) -> float:
+    times = []
+    for _ in range(runs):
+        gc.collect()
+        start = perf_counter()
+        build(size)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def compacted(depth: int) -> float:
+    "the seconds compact() takes on a rendered and hashed chain, the build left out"
+    tree = chain(depth)
+    str(tree)
+    tree.content_hash()
+    gc.collect()
+    start = perf_counter()
+    compact(tree)
+    return perf_counter() - start
+
+
+def main() -> None:
+    indexed = wide(1_000)
+    for alive in (False, True):
+        if alive:
+            indexed.select("li")  # a tree index now exists, new trees still skip it
+        print(f"\n{'with an indexed page' if alive else 'no tree index'}")
+        for name, build in (("chain", chain), ("wide", wide)):
+            for size in (2_000, 4_000, 8_000):
+                seconds = best(build, size)
+                print(f"{name:<6} {size:>6} nodes {seconds * 1e3:8.1f} ms {seconds / size * 1e6:6.2f} us/node")
+    print("\ncompact()")
+    for size in (2_000, 4_000, 8_000):
+        seconds = min(compacted(size) for _ in range(3))
+        print(f"{'chain':<6} {size:>6} nodes {seconds * 1e3:8.1f} ms {seconds / size * 1e6:6.2f} us/node")
+
+
+if __name__ == "__main__":
+    main()
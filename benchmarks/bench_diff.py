@@ -0,0 +1,42 @@
+"""times web.diff on a dashboard of about 50k nodes where a few cells change between two
+renders, and compares the size of the json patches with the full page
+
+run with `python -m benchmarks.bench_diff` from the repository root
+"""
+
+from timeit import repeat
+from web.diff import apply_patches, diff, patches_to_json
+from web.html_ import HTMLobj
+from web.parser import parse
+
+
+def dashboard(rows: int = 5_000, tick: int = 0) -> HTMLobj:
+    "rows of 4 cells (a row is 10 nodes with its texts), every 500th row changes each tick"
+    table = HTMLobj("table", None, "dashboard")
+    for i in range(rows):
+        value = i * (tick + 1) if i % 500 == 0 else i
+        row = HTMLobj("tr", None, None, key=f"row-{i}")
+        for j, text in enumerate((f"host {i}", str(value), "up", f"{value % 100}%")):
+            row.add(HTMLobj("td", None, "cell" if j else "name", text))
+        table.add(row)
+    return table
+
+
+def main() -> None:
+    before, after = dashboard(), dashboard(tick=1)
+    reversed_rows = dashboard()
+    reversed_rows.contents = reversed_rows.contents[::-1]
+    for name, new in (("few texts", after), ("rows reversed", reversed_rows)):
+        patches = diff(before, new)
+        assert str(apply_patches(parse(str(before)), patches)) == str(new)
+        seconds = min(repeat(lambda: diff(before, new), number=1, repeat=5))
+        patch_size = len(patches_to_json(patches).encode("utf-8"))
+        page_size = len(str(new).encode("utf-8"))
+        print(
+            f"{name:<14} {len(patches):6} patches {seconds * 1e3:8.1f} ms "
+            f"{patch_size / 1e3:9.1f} kB json vs {page_size / 1e3:.1f} kB page"
+        )
+
+
+if __name__ == "__main__":
+    main()
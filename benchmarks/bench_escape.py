@@ -0,0 +1,76 @@
+"""compares HTMLobj.__tag__, which escapes every attribute value, with the former
+version that escaped nothing, and times the escaping of text contents. the escaped
+attributes are kept by the node (the inline css by its CSSobj) until it changes :
+"first" writes nodes without them, "again" the same nodes once more. the whole
+rendering is compared across commits with `python -m benchmarks.suite --compare`
+
+run with `python -m benchmarks.bench_escape` from the repository root
+"""
+
+from timeit import repeat
+from web.css import CSSobj
+from web.html_ import HTMLobj
+from web.markup import escape
+
+
+def legacy_tag(node: HTMLobj) -> tuple[str, str]:
+    "HTMLobj.__tag__ before web.markup, kept here as the reference"
+    attributes = []
+    if isinstance(node.css, CSSobj):
+        attributes.append(f'styles="{node.css.inline_css()}"')
+    if node.class_:
+        attributes.append(f"class={node.class_}")
+    for i in node.attributes or {}:
+        attributes.append(f'{i}="{node.attributes[i]}"')
+    attributes = f" {' '.join(attributes)}" if attributes else ""
+    if node.self_closing:
+        return f"<{node.tag}{attributes}", "/>"
+    return f"<{node.tag}{attributes}>", f"</{node.tag}>"
+
+
+def nodes(count: int = 2_000) -> dict[str, list[HTMLobj]]:
+    return {
+        "plain": [HTMLobj("p") for _ in range(count)],
+        "class": [HTMLobj("li", None, f"item item-{i}") for i in range(count)],
+        "attributes": [
+            HTMLobj("input", None, "field", type="text", name=f"f{i}", value=f"v{i}", maxlength="64")
+            for i in range(count)
+        ],
+        "styles": [HTMLobj("td", CSSobj(color="#333", padding=f"{i % 8}px")) for i in range(count)],
+        "to escape": [HTMLobj("a", None, None, href=f"/?a={i}&b=2", title='say "hi"') for i in range(count)],
+    }
+
+
+def best(function, items: list, setup=lambda: None) -> float:
+    "many runs over a small list, the least disturbed one is kept"
+    return min(repeat(lambda: [function(i) for i in items], setup, number=1, repeat=400))
+
+
+def forget(items: list[HTMLobj]) -> None:
+    "drops the attributes kept by the nodes and the inline css kept by their CSSobj"
+    for i in items:
+        object.__setattr__(i, "_start", None)
+        if i.css is not None:
+            object.__setattr__(i.css, "_attribute", None)
+
+
+def main() -> None:
+    print(f"{'start tags':<16} {'legacy':>9} {'first':>9} {'again':>9}")
+    for name, items in nodes().items():
+        legacy = best(legacy_tag, items)
+        first = best(HTMLobj.__tag__, items, lambda: forget(items))
+        again = best(HTMLobj.__tag__, items)
+        print(
+            f"{name:<16} {legacy * 1e3:7.2f}ms {first * 1e3:7.2f}ms {again * 1e3:7.2f}ms "
+            f"{legacy / first:6.2f}x {legacy / again:6.2f}x"
+        )
+    texts = {
+        "plain texts": [f"some text number {i}" for i in range(2_000)],
+        "texts to escape": [f"a < b & c number {i}" for i in range(2_000)],
+    }
+    for name, items in texts.items():
+        print(f"{name:<16} {best(str, items) * 1e3:7.2f}ms {best(escape, items) * 1e3:7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""measures the cold start of the package, the import time of `web` and its modules in
+fresh interpreters against the former eager imports, and the item and attribute access
+of HTMLobj and Var against the singledispatchmethod dispatch they used to go through
+
+run with `python -m benchmarks.bench_import` from the repository root
+"""
+
+import subprocess
+import sys
+from functools import singledispatchmethod
+from timeit import repeat
+from typing import Any
+from web.html_ import HTMLobj
+from web.js import Var
+
+IMPORTS = {
+    "import web": "import web",
+    "import web.html_": "import web.html_",
+    "from web import render_many": "from web import render_many",
+    # what `import web` and `import web.html_` loaded before the lazy imports
+    "former eager import web": "import web.css, web.html_, web.js, functools, hashlib, uuid, webbrowser",
+}
+
+# times the import alone, the interpreter start is the same for every case
+_TIMED = "from time import perf_counter as p\ns = p()\n{}\nprint(p() - s)"
+
+
+def import_time(statement: str, runs: int = 15) -> float:
+    "the best time of the statement in fresh interpreters, with the modules compiled"
+    best = float("inf")
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _TIMED.format(statement)], capture_output=True, text=True, check=True
+        )
+        best = min(best, float(output.stdout))
+    return best
+
+
+class LegacyNode:
+    "the item access of HTMLobj and Var before the type checks, kept here as the reference"
+
+    def __init__(self) -> None:
+        self.attributes, self.contents = {"id": "main"}, ["text"]
+
+    @singledispatchmethod
+    def __getitem__(self, _key: Any):
+        return NotImplemented
+
+    @__getitem__.register
+    def _(self, key: str):
+        return self.attributes[key]
+
+    @__getitem__.register
+    def _(self, index: int):
+        return self.contents[index]
+
+    @singledispatchmethod
+    def __setitem__(self, _key: Any, _value: Any) -> None:
+        return NotImplemented
+
+    @__setitem__.register
+    def _(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @__setitem__.register
+    def _(self, index: int, value: Any):
+        self.contents[index] = value
+
+
+def per_call(statement: str, namespace: dict) -> float:
+    return min(repeat(statement, globals=namespace, number=100_000, repeat=7)) / 100_000
+
+
+def main() -> None:
+    for name, statement in IMPORTS.items():
+        print(f"{name:<30} {import_time(statement) * 1e3:8.2f} ms")
+    namespace = {
+        "node": HTMLobj("div", None, None, "text", id="main"),
+        "legacy": LegacyNode(),
+        "var": Var("config", "hash"),
+    }
+    namespace["var"]["debug"] = "false"
+    accesses = {
+        'node["id"]': ('node["id"]', 'legacy["id"]'),
+        "node[0]": ("node[0]", "legacy[0]"),
+        'node["id"] = value': ('node["id"] = "main"', 'legacy["id"] = "main"'),
+        "node[0] = value": ('node[0] = "text"', 'legacy[0] = "text"'),
+    }
+    print(f"\n{'access':<30} {'legacy':>9} {'now':>9}")
+    for name, (current, legacy) in accesses.items():
+        old, new = per_call(legacy, namespace), per_call(current, namespace)
+        print(f"{name:<30} {old * 1e9:7.0f}ns {new * 1e9:7.0f}ns {old / new:6.2f}x")
+    for name in ('var["debug"]', 'var["debug"] = "true"', "var.debug"):
+        print(f"{name:<30} {'':>9} {per_call(name, namespace) * 1e9:7.0f}ns")
+
+
+if __name__ == "__main__":
+    main()
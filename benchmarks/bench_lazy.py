@@ -0,0 +1,88 @@
+"""renders a table of database rows (an in memory sqlite table) built up front and
+streamed from the cursor through Lazy contents, in time and peak memory (measured
+apart with tracemalloc). checks first that a pretty table whose cursor gives no row
+renders like one without rows
+
+run with `python -m benchmarks.bench_lazy` from the repository root
+"""
+
+import gc
+import sqlite3
+import tracemalloc
+from time import perf_counter
+from typing import Callable, Iterator
+from web.html_ import HTMLobj, Lazy
+
+
+class Discard:
+    "a sink throwing the bytes away, the page size is all we want"
+
+    def write(self, data: bytes) -> None:
+        pass
+
+
+def database(rows: int) -> sqlite3.Connection:
+    connection = sqlite3.connect(":memory:")
+    connection.execute("create table orders (id integer, customer text, total real)")
+    connection.executemany(
+        "insert into orders values (?, ?, ?)",
+        ((i, f"customer {i % 977}", i * 1.25) for i in range(rows)),
+    )
+    return connection
+
+
+def row(record: tuple) -> HTMLobj:
+    return HTMLobj("tr", None, None, *(HTMLobj("td", None, None, str(i)) for i in record))
+
+
+def cursor_rows(connection: sqlite3.Connection) -> Iterator[HTMLobj]:
+    return map(row, connection.execute("select id, customer, total from orders"))
+
+
+def measure(operation: Callable[[], int]) -> tuple[float, int, int]:
+    "the time of a run, then the peak memory of one more traced run"
+    gc.collect()
+    start = perf_counter()
+    size = operation()
+    seconds = perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, size
+
+
+def check_empty_cursor() -> None:
+    connection = database(0)
+    for pretty in (False, True):
+        lazy = HTMLobj("table", None, None, Lazy(lambda: cursor_rows(connection)))
+        assert (lazy.prettify() if pretty else str(lazy)) == "<table></table>"
+        assert HTMLobj("div", None, None, lazy).prettify() == HTMLobj(
+            "div", None, None, HTMLobj("table")
+        ).prettify()
+
+
+def main() -> None:
+    check_empty_cursor()
+    for rows in (10_000, 50_000):
+        connection = database(rows)
+
+        def eager() -> int:
+            table = HTMLobj("table", None, None, *cursor_rows(connection))
+            return table.render_into(Discard())
+
+        def lazy() -> int:
+            table = HTMLobj("table", None, None, Lazy(lambda: cursor_rows(connection)))
+            return table.render_into(Discard())
+
+        for name, operation in (("rows built first", eager), ("Lazy cursor rows", lazy)):
+            seconds, peak, size = measure(operation)
+            print(
+                f"{rows:>7} {name:<17} {seconds * 1e3:8.1f} ms {peak / 1e6:8.2f} MB peak "
+                f"{size / 1e6:6.1f} MB of html"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""measures the bytes per node of a generated report with tracemalloc : as built,
+after web.compact.compact and stored as a web.compact.ArenaDocument
+
+run with `python -m benchmarks.bench_memory` from the repository root
+"""
+
+import gc
+import tracemalloc
+from web.compact import ArenaDocument, compact
+from web.css import CSSobj
+from web.html_ import HTMLobj
+
+
+def report(rows: int) -> HTMLobj:
+    table = HTMLobj("table", None, "report")
+    for i in range(rows):
+        row = HTMLobj("tr", None, "row")
+        for j in range(4):
+            row.add(HTMLobj("td", CSSobj(text_align="right"), "cell", f"{i * j}", data_col=f"{j}"))
+        row.add(HTMLobj("td", None, None, HTMLobj("br")))
+        table.add(row)
+    return table
+
+
+def count(node: HTMLobj) -> int:
+    total, stack = 0, [node]
+    while stack:
+        node = stack.pop()
+        total += 1
+        if isinstance(node, HTMLobj):
+            stack.extend(node.contents or ())
+    return total
+
+
+def traced(func):
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main(rows: int = 30_000) -> None:
+    tree, built = traced(lambda: report(rows))
+    nodes, text = count(tree), str(tree)
+    del tree
+    tree, compacted = traced(lambda: compact(report(rows)))
+    assert str(tree) == text
+    del tree
+    arena, arena_size = traced(lambda: ArenaDocument(report(rows)))
+    assert str(arena) == text
+    print(f"{nodes} nodes (elements and texts)")
+    for name, size in (("HTMLobj", built), ("compact()", compacted), ("ArenaDocument", arena_size)):
+        print(f"{name:<14} {size / nodes:8.1f} bytes/node {size / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
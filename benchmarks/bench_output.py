@@ -0,0 +1,86 @@
+"""compares building the page string then encoding it with rendering straight to bytes
+through web.output, in time and peak memory (measured apart with tracemalloc)
+
+run with `python -m benchmarks.bench_output` from the repository root
+"""
+
+import gc
+import os
+import tempfile
+import tracemalloc
+from time import perf_counter
+from typing import Callable
+from web.html_ import HTMLobj
+
+
+def page(rows: int = 20_000) -> HTMLobj:
+    return HTMLobj(
+        "table",
+        None,
+        "report",
+        *(
+            HTMLobj("tr", None, None, *(HTMLobj("td", None, None, f"cell {i}:{j} é") for j in range(4)))
+            for i in range(rows)
+        ),
+    )
+
+
+def measure(operation: Callable[[], object], repeat: int = 3) -> tuple[float, int]:
+    "best time of a few runs, then the peak memory of one more traced run"
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = perf_counter()
+        operation()
+        best = min(best, perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> None:
+    tree = page()
+    path = os.path.join(tempfile.mkdtemp(), "page.html")
+
+    def string_export() -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(tree.prettify("\t"))
+
+    def string_bytes() -> bytes:
+        return str(tree).encode("utf-8")
+
+    def into_bytearray() -> bytearray:
+        sink = bytearray()
+        tree.render_into(sink)
+        return sink
+
+    buffer = bytearray(len(string_bytes()))  # sized once, as a server reusing its buffers
+
+    def fill_bytearray() -> bytearray:
+        tree.render_into(buffer, fill=True)
+        return buffer
+
+    def gzip_bytearray() -> bytearray:
+        sink = bytearray()
+        tree.render_into(sink, compress="gzip")
+        return sink
+
+    cases = (
+        ("prettify + text file", string_export),
+        ("export (bytes)", lambda: tree.export(path)),
+        ("str().encode()", string_bytes),
+        ("render_into bytearray", into_bytearray),
+        ("fill sized bytearray", fill_bytearray),
+        ("render_into gzip", gzip_bytearray),
+    )
+    for name, operation in cases:
+        seconds, peak = measure(operation)
+        print(f"{name:<22} {seconds * 1e3:8.1f} ms {peak / 1e6:8.2f} MB peak")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""compares web.parser against a html.parser based builder on multi megabyte documents,
+after checking that markup with implied end tags parses to a stable tree
+
+run with `python -m benchmarks.bench_parse` from the repository root
+"""
+
+from html.parser import HTMLParser
+from io import StringIO
+from time import perf_counter
+from web.html_ import HTMLobj, is_self_closing_tag
+from web.parser import iter_parse, parse
+
+
+class BaselineBuilder(HTMLParser):
+    "the usual way of building HTMLobj trees on top of the standard library parser"
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.stack = [HTMLobj("root")]
+
+    def handle_starttag(self, tag, attrs) -> None:
+        attributes = {k: v or "" for k, v in attrs}
+        node = HTMLobj(tag, None, attributes.pop("class", None))
+        node.attributes = attributes
+        self.stack[-1].add(node)
+        if not is_self_closing_tag(tag):
+            self.stack.append(node)
+
+    def handle_endtag(self, tag) -> None:
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                break
+
+    def handle_data(self, data) -> None:
+        if not data.isspace():
+            self.stack[-1].add(data)
+
+
+def document(rows: int) -> str:
+    row = (
+        '<tr class="row"><td class="id">{0}</td><td><a href="/item/{0}" title="Item {0}">'
+        "Item {0}</a></td><td style=\"color: red; text-align: right\">{0}.00</td>"
+        "<td><img src=\"/icons/{0}.png\" alt=\"icon\"><br></td></tr>\n"
+    )
+    body = "".join(row.format(i) for i in range(rows))
+    return f"<!DOCTYPE html><html><head><title>Report</title></head><body><table>{body}</table></body></html>"
+
+
+# (markup leaving end tags out, the markup of its tree)
+IMPLIED_ENDS = (
+    ("<table><tr><td>1<td>2<tr><td>3</table>", "<table><tr><td>1</td><td>2</td></tr><tr><td>3</td></tr></table>"),
+    ("<ul><li><p>a<li>b</ul>", "<ul><li><p>a</p></li><li>b</li></ul>"),
+    ("<ul><li>a<ul><li>b</ul><li>c</ul>", "<ul><li>a<ul><li>b</li></ul></li><li>c</li></ul>"),
+    (
+        "<table><tr><td><table><tr><td>x</table><td>y</table>",
+        "<table><tr><td><table><tr><td>x</td></tr></table></td><td>y</td></tr></table>",
+    ),
+    ("<dl><dt>a<dd>b<dt>c</dl>", "<dl><dt>a</dt><dd>b</dd><dt>c</dt></dl>"),
+)
+
+
+def check_implied_ends() -> None:
+    "each tree renders to the expected markup, which parses back to the same tree"
+    for source, expected in IMPLIED_ENDS:
+        rendered = str(parse(source))
+        assert rendered == expected, (source, rendered)
+        assert str(parse(rendered)) == rendered, source
+
+
+def timed(func) -> float:
+    start = perf_counter()
+    func()
+    return perf_counter() - start
+
+
+def main() -> None:
+    check_implied_ends()
+    for rows in (10_000, 40_000):
+        text = document(rows)
+        megabytes = len(text.encode()) / 1e6
+
+        def baseline() -> None:
+            builder = BaselineBuilder()
+            builder.feed(text)
+            builder.close()
+
+        results = {
+            "html.parser": timed(baseline),
+            "parse": timed(lambda: parse(text)),
+            "iter_parse rows": timed(
+                lambda: sum(1 for _ in iter_parse(StringIO(text), level=3))
+            ),
+        }
+        for name, seconds in results.items():
+            print(f"{megabytes:6.1f} MB {name:<16} {seconds:7.3f} s {megabytes / seconds:7.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
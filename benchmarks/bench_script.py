@@ -0,0 +1,63 @@
+"""compares the generation time and output size of a script of thousands of functions
+rendered by the former recursive Function.as_script and by web.script.Script, pretty
+and minified
+
+run with `python -m benchmarks.bench_script` from the repository root
+"""
+
+from timeit import repeat
+from web.js import Function, Return, Var
+from web.script import Script
+
+
+def recursive_as_script(function: Function) -> str:
+    "Function.as_script before web.script, kept here as the reference"
+    contents = []
+    for i in function.contents:
+        if i is None:
+            continue
+        elif isinstance(i, Function):
+            i.indent_lev = function.indent_lev + 1
+            contents.append(recursive_as_script(i))
+        else:
+            contents.append(str(i))
+    contents = "\n" + "\n".join(contents) + "\n" if contents else ""
+    arguments = ", ".join(function.args_demanded)
+    return f"{'async ' if function.async_ else ''}function {function.name}({arguments}) {{{contents}\n}}"
+
+
+def widgets(count: int = 2_000) -> Function:
+    "a data driven page script, one small render function per widget"
+    main = Function("renderWidgets", "container", "data", is_async=True)
+    for i in range(count):
+        widget = Function(f"widget{i}", "element", "options")
+        widget.append(Var("values", "array", f"data.widgets[{i}].values", "const"))
+        widget.append("// scale the values to the height of the element")
+        widget.append("const maximum = Math.max(...values, 1);")
+        widget.append("for (let index = 0; index < values.length; index++) {")
+        widget.append("    element.children[index].style.height = (values[index] / maximum * 100) + '%';")
+        widget.append("}")
+        widget.append(Return("element"))
+        main.append(widget)
+        main.append(f"widget{i}(container.children[{i}], data.options);")
+    return main
+
+
+def main() -> None:
+    tree = widgets()
+    script = Script(tree)
+    assert recursive_as_script(tree) == script.render()
+    cases = (
+        ("recursive as_script", lambda: recursive_as_script(tree)),
+        ("Script pretty", lambda: script.render()),
+        ("Script minified", lambda: script.render(minify=True, mangle=False)),
+        ("Script mangled", lambda: script.render(minify=True)),
+    )
+    for name, render in cases:
+        seconds = min(repeat(render, number=1, repeat=5))
+        size = len(render().encode("utf-8"))
+        print(f"{name:<20} {seconds * 1e3:8.1f} ms {size / 1e3:9.1f} kB")
+
+
+if __name__ == "__main__":
+    main()
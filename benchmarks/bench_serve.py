@@ -0,0 +1,100 @@
+"""measures the time to first byte of a large page served by web.serve against an app
+sending the whole str() at once, with many requests on one event loop, a fresh page
+built per request (no ETag unless the handler hashes it) and the cost of a 304
+revalidation
+
+run with `python -m benchmarks.bench_serve` from the repository root
+"""
+
+import asyncio
+from statistics import median
+from time import perf_counter
+from web.abstractions.document import GetPage
+from web.html_ import HTMLobj
+from web.serve import TestClient, asgi_app, tree_etag, wsgi_app
+
+
+def page(rows: int = 5_000) -> HTMLobj:
+    document = GetPage(
+        HTMLobj("h1", None, None, "Report"),
+        HTMLobj(
+            "table",
+            None,
+            "report",
+            *(
+                HTMLobj("tr", None, None, *(HTMLobj("td", None, None, f"cell {i}:{j}") for j in range(4)))
+                for i in range(rows)
+            ),
+        ),
+    )
+    document.find("head").append(HTMLobj("link", rel="stylesheet", href="/static/report.css"))
+    return document
+
+
+def hashed_page(request) -> HTMLobj:
+    "a fresh page whose handler asks for an ETag, hashing it before the first byte"
+    tree = page()
+    tree_etag(tree)
+    return tree
+
+
+def whole_page_app(tree: HTMLobj):
+    "the former glue, waits for the full str() before sending anything"
+
+    async def app(scope: dict, receive, send) -> None:
+        body = f"<!DOCTYPE html>{tree}".encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/html; charset=utf-8")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+async def load(client: TestClient, requests: int) -> list:
+    return await asyncio.gather(*(client.request_async("GET", "/") for _ in range(requests)))
+
+
+def report(name: str, responses: list) -> None:
+    first = sorted(response.first_byte for response in responses)
+    print(
+        f"{name:<26} ttfb median {median(first) * 1e3:7.1f} ms "
+        f"p95 {first[int(len(first) * 0.95) - 1] * 1e3:7.1f} ms "
+        f"last response {max(response.seconds for response in responses) * 1e3:7.1f} ms"
+    )
+
+
+def main(requests: int = 20) -> None:
+    tree = page()
+    tree_etag(tree)  # a page served many times is hashed once
+    cases = (
+        ("whole str()", TestClient(whole_page_app(tree))),
+        ("web.serve streamed", TestClient(asgi_app(lambda request: tree))),
+        ("web.serve without etag", TestClient(asgi_app(lambda request: tree, etag=False))),
+    )
+    for name, client in cases:
+        client.get("/")  # warm up
+        report(f"{name} x{requests}", asyncio.run(load(client, requests)))
+    assert "etag" in TestClient(asgi_app(lambda request: tree)).get("/").headers
+    fresh = TestClient(asgi_app(lambda request: page()))
+    assert "etag" not in fresh.get("/").headers  # never hashed before the first byte
+    for name, client in (("fresh page", fresh), ("fresh page + etag", TestClient(asgi_app(hashed_page)))):
+        report(f"{name} x5", [client.get("/") for _ in range(5)])
+    client = TestClient(wsgi_app(lambda request: tree))
+    report("wsgi streamed x1", [client.get("/") for _ in range(5)])
+    tree.invalidate()
+    start = perf_counter()
+    etag = tree_etag(tree)
+    print(f"{'etag of a changed tree':<26} {(perf_counter() - start) * 1e3:7.1f} ms")
+    start = perf_counter()
+    for _ in range(100):
+        assert client.get("/", {"If-None-Match": etag}).status == 304
+    print(f"{'304 revalidation':<26} {(perf_counter() - start) / 100 * 1e6:7.1f} us per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""measures share_subtrees on a repetitive page (icons, badges, identical cells) : the
+memory held by the tree before and after, the rendering time, and the cost of
+content_hash, cold and cached, against comparing rendered strings
+
+run with `python -m benchmarks.bench_share` from the repository root
+"""
+
+import gc
+import tracemalloc
+from timeit import repeat
+from web.abstractions.document import GetPage
+from web.compact import share_subtrees
+from web.css import CSSobj
+from web.html_ import HTMLobj
+
+
+def icon(name: str) -> HTMLobj:
+    return HTMLobj(
+        "span",
+        CSSobj(display="inline-block", width="16px", height="16px"),
+        "icon",
+        HTMLobj("svg", None, None, HTMLobj("use", href=f"/icons.svg#{name}"), viewBox="0 0 16 16"),
+    )
+
+
+def page(rows: int = 5_000) -> HTMLobj:
+    return GetPage(
+        HTMLobj(
+            "table",
+            None,
+            "orders",
+            *(
+                HTMLobj(
+                    "tr",
+                    None,
+                    "order",
+                    HTMLobj("td", None, None, f"order {i}"),
+                    HTMLobj("td", None, "status", icon("ok" if i % 3 else "late"), "shipped"),
+                    HTMLobj("td", None, "actions", icon("edit"), icon("delete")),
+                )
+                for i in range(rows)
+            ),
+        )
+    )
+
+
+def held_memory(build) -> tuple[object, int]:
+    "the result of build and the memory it keeps once the garbage is collected"
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main() -> None:
+    tree, plain_size = held_memory(page)
+    shared, shared_size = held_memory(lambda: share_subtrees(page()))
+    assert str(tree) == str(shared)
+    print(f"{'memory':<22} {plain_size / 1e6:8.2f} MB {shared_size / 1e6:8.2f} MB shared")
+    plain = min(repeat(lambda: str(tree), number=1, repeat=10))
+    fast = min(repeat(lambda: str(shared), number=1, repeat=10))
+    print(f"{'str()':<22} {plain * 1e3:8.2f} ms {fast * 1e3:8.2f} ms shared ({plain / fast:.1f}x)")
+    fresh = [page() for _ in range(3)]
+    cold = min(min(repeat(i.content_hash, number=1, repeat=1)) for i in fresh)
+    cached = min(repeat(tree.content_hash, number=1000, repeat=5)) / 1000
+    print(f"{'content_hash':<22} {cold * 1e3:8.2f} ms cold {cached * 1e9:8.0f} ns cached")
+    rows = tree.find("body").contents[0].contents
+    by_hash = min(repeat(lambda: rows[1].content_hash() == rows[4].content_hash(), number=1000, repeat=5))
+    by_string = min(repeat(lambda: str(rows[1]) == str(rows[4]), number=1000, repeat=5))
+    print(f"{'equal rows':<22} {by_string * 1e3:8.2f} us str() {by_hash * 1e3:8.2f} us hash")
+
+
+if __name__ == "__main__":
+    main()
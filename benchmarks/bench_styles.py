@@ -0,0 +1,44 @@
+"""measures the output size and render time of a page of identically styled cells
+with inline styles and after web.abstractions.document.hoist_styles
+
+run with `python -m benchmarks.bench_styles` from the repository root
+"""
+
+from timeit import repeat
+from web.abstractions.document import GetPage, hoist_styles
+from web.css import CSSobj
+from web.html_ import HTMLobj
+
+
+def page(rows: int = 2_500) -> HTMLobj:
+    cells = []
+    for i in range(rows):
+        row = HTMLobj("tr")
+        for j in range(4):
+            style = CSSobj(text_align="right", padding="2px 4px", border="1px solid #ccc")
+            if j == 0:
+                style["font-weight"] = "bold"
+            row.add(HTMLobj("td", style, None, str(i * j)))
+        cells.append(row)
+    return GetPage(HTMLobj("table", None, None, *cells))
+
+
+def measure(tree: HTMLobj) -> tuple[int, float]:
+    size = len(str(tree).encode("utf-8"))
+    seconds = min(repeat(lambda: str(tree), number=3, repeat=3)) / 3
+    return size, seconds
+
+
+def main() -> None:
+    inline = measure(page())
+    hoisted_page = page()
+    sheet = hoist_styles(hoisted_page)
+    hoisted = measure(hoisted_page)
+    print(f"{len(sheet)} generated classes")
+    for name, (size, seconds) in (("inline css", inline), ("hoisted", hoisted)):
+        print(f"{name:<11} {size / 1e3:9.1f} kB {seconds * 1e3:8.1f} ms/render")
+    print(f"size {inline[0] / hoisted[0]:.1f}x smaller, render {inline[1] / hoisted[1]:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""compares a compiled Template against building the page with GetPage and str() on every request
+
+run with `python -m benchmarks.bench_template` from the repository root
+"""
+
+from timeit import repeat
+from web.abstractions.document import GetPage
+from web.html_ import HTMLobj, Basic_HTMLobj
+from web.template import Slot, Template
+
+
+def layout(title, content) -> HTMLobj:
+    nav = Basic_HTMLobj(
+        "nav",
+        *(HTMLobj("a", None, "nav-link", f"Link {i}", href=f"/page/{i}") for i in range(20)),
+    )
+    footer = Basic_HTMLobj(
+        "footer", *(HTMLobj("p", None, "small", f"Footer line {i}") for i in range(10))
+    )
+    main = HTMLobj("main", None, "content", HTMLobj("h1", None, None, title), content)
+    return GetPage(nav, main, footer)
+
+
+def main(number: int = 2000) -> None:
+    template = Template(layout(Slot("title"), Slot("content")))
+    values = {"title": "Hello <world>", "content": "Some page content & more"}
+
+    def dynamic() -> str:
+        return str(layout("Hello <world>", "Some page content & more"))
+
+    def compiled() -> str:
+        return template.render(**values)
+
+    assert dynamic() == compiled()
+    results = {}
+    for name, func in (("GetPage + str", dynamic), ("Template.render", compiled)):
+        best = min(repeat(func, number=number, repeat=5)) / number
+        results[name] = best
+        print(f"{name:<16} {best * 1e6:10.2f} us/page")
+    print(f"speedup          {results['GetPage + str'] / results['Template.render']:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
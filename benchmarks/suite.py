@@ -0,0 +1,219 @@
+"""rendering benchmark suite for the html_, css and js engines
+
+run with `python -m benchmarks.suite` from the repository root. every case is timed at
+every size and reports nodes/s, bytes/s and the peak memory of one run (tracemalloc).
+`--json results.json` saves the numbers, `--compare results.json` prints the speed of
+this tree relative to a saved run, e.g. one made on another commit
+"""
+
+import gc
+import json
+import platform
+import tracemalloc
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import Callable
+from web.abstractions.document import GetPage
+from web.css import CSSobj
+from web.html_ import HTMLobj
+from web.js import Function
+
+
+def wide(size: int) -> HTMLobj:
+    return HTMLobj("div", None, "wide", *(HTMLobj("p", None, None, f"item {i}") for i in range(size)))
+
+
+def deep(size: int) -> HTMLobj:
+    root = node = HTMLobj("div")
+    for i in range(size):
+        child = HTMLobj("div", None, None, f"level {i}")
+        node.add(child)
+        node = child
+    return root
+
+
+def attribute_heavy(size: int) -> HTMLobj:
+    return HTMLobj(
+        "form",
+        None,
+        None,
+        *(
+            HTMLobj(
+                "input",
+                None,
+                "field",
+                type="text",
+                name=f"field{i}",
+                id=f"field-{i}",
+                value=f"value {i}",
+                placeholder="Type here",
+                maxlength="64",
+                autocomplete="off",
+                tabindex=str(i),
+            )
+            for i in range(size)
+        ),
+    )
+
+
+def style_heavy(size: int) -> HTMLobj:
+    def css(i: int) -> CSSobj:
+        return CSSobj(
+            color="#333",
+            background="#fff",
+            margin="0 auto",
+            padding=f"{i % 8}px",
+            border="1px solid #ccc",
+            font_size="14px",
+            line_height="1.4",
+            text_align="left",
+        )
+
+    return HTMLobj("div", None, None, *(HTMLobj("span", css(i), None, str(i)) for i in range(size)))
+
+
+def document(size: int) -> HTMLobj:
+    sections = (
+        HTMLobj(
+            "section",
+            None,
+            "card",
+            HTMLobj("h2", None, None, f"Section {i}"),
+            HTMLobj("p", None, "text", "Lorem ipsum dolor sit amet."),
+            HTMLobj("a", None, None, "more", href=f"/section/{i}"),
+        )
+        for i in range(size // 4)
+    )
+    return GetPage(*sections)
+
+
+def script(size: int) -> Function:
+    main = Function("main", "data", is_async=True)
+    for i in range(size // 10):
+        helper = Function(f"helper{i}", "value")
+        for j in range(9):
+            helper.append(f"value = value + {j};")
+        main.append(helper)
+    return main
+
+
+def count(tree) -> int:
+    if isinstance(tree, Function):
+        stack, total = [tree], 0
+        while stack:
+            function = stack.pop()
+            total += 1 + len(function.contents)
+            stack.extend(i for i in function.contents if isinstance(i, Function))
+        return total
+    stack, total = [tree], 0
+    while stack:
+        node = stack.pop()
+        total += 1
+        if isinstance(node, HTMLobj):
+            stack.extend(node.contents or ())
+    return total
+
+
+def first_tag(tree: HTMLobj) -> str:
+    return "".join(tree.__tag__())
+
+
+def inline_styles(tree: HTMLobj) -> str:
+    return "".join(i.css.inline_css() for i in tree.contents)
+
+
+def all_tags(tree: HTMLobj) -> str:
+    return "".join("".join(i.__tag__()) for i in tree.contents)
+
+
+# case name -> (tree builder, {operation name: operation})
+CASES: dict[str, tuple[Callable, dict[str, Callable]]] = {
+    "wide": (wide, {"str": str, "prettify": HTMLobj.prettify}),
+    "deep": (deep, {"str": str}),
+    "attributes": (attribute_heavy, {"str": str, "__tag__": all_tags}),
+    "styles": (style_heavy, {"str": str, "inline_css": inline_styles}),
+    "document": (document, {"str": str, "prettify": HTMLobj.prettify}),
+    "js": (script, {"as_script": Function.as_script}),
+}
+
+
+def measure(operation: Callable, tree, repeat: int) -> tuple[float, int]:
+    "best time of a few runs and the size of the output"
+    best, output = float("inf"), ""
+    for _ in range(repeat):
+        gc.collect()
+        start = perf_counter()
+        output = operation(tree)
+        best = min(best, perf_counter() - start)
+    return best, len(output.encode("utf-8"))
+
+
+def peak_memory(operation: Callable, tree) -> int:
+    gc.collect()
+    tracemalloc.start()
+    operation(tree)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run(sizes: list[int], cases: list[str], repeat: int) -> list[dict]:
+    results = []
+    for case in cases:
+        build, operations = CASES[case]
+        for size in sizes:
+            tree = build(size)
+            nodes = count(tree)
+            for name, operation in operations.items():
+                seconds, output_bytes = measure(operation, tree, repeat)
+                results.append(
+                    {
+                        "case": case,
+                        "size": size,
+                        "operation": name,
+                        "nodes": nodes,
+                        "seconds": seconds,
+                        "nodes_per_sec": nodes / seconds,
+                        "bytes": output_bytes,
+                        "bytes_per_sec": output_bytes / seconds,
+                        "peak_bytes": peak_memory(operation, tree),
+                    }
+                )
+    return results
+
+
+def main() -> None:
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000", help="comma separated tree sizes")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma separated cases")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="file to save the results to")
+    parser.add_argument("--compare", help="results saved by an earlier run")
+    args = parser.parse_args()
+    results = run([int(i) for i in args.sizes.split(",")], args.cases.split(","), args.repeat)
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            for row in json.load(f)["results"]:
+                baseline[row["case"], row["size"], row["operation"]] = row
+    print(
+        f"{'case':<11} {'size':>7} {'operation':<11} {'nodes/s':>12} {'MB/s':>8} "
+        f"{'peak MB':>8}{'   vs base' if baseline else ''}"
+    )
+    for row in results:
+        line = (
+            f"{row['case']:<11} {row['size']:>7} {row['operation']:<11} "
+            f"{row['nodes_per_sec']:>12,.0f} {row['bytes_per_sec'] / 1e6:>8.2f} "
+            f"{row['peak_bytes'] / 1e6:>8.2f}"
+        )
+        old = baseline.get((row["case"], row["size"], row["operation"]))
+        if old:
+            line += f" {old['seconds'] / row['seconds']:>9.2f}x"
+        print(line)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,26 @@
-import web.css
-import web.html_
-import web.js  # noqa: F401
+from importlib import import_module
+
+# the submodules and shortcuts are imported on first use, `import web` loads nothing
+# more so scripts and serverless functions only pay for what they touch
+
+_SUBMODULES = frozenset(
+    ("batch", "binary", "compact", "css", "diff", "html_", "js", "markup", "output", "parser")
+    + ("script", "selector", "serve", "template", "abstractions")
+)
+_SHORTCUTS = {"render_many": "web.batch", "render_many_async": "web.batch"}
+
+__all__ = ["render_many", "render_many_async"]
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return import_module(f"web.{name}")  # the import sets it on the package too
+    module = _SHORTCUTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'web' has no attribute {name!r}")
+    value = globals()[name] = getattr(import_module(module), name)
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_SUBMODULES, *_SHORTCUTS})
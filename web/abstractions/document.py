@@ -1,4 +1,5 @@
 import web.html_
+from web.css import CSSobj, Stylesheet
 
 
 def GetPage(*contents) -> web.html_.HTMLobj:
@@ -21,4 +22,42 @@ def GetPage(*contents) -> web.html_.HTMLobj:
     return html
 
 
+def extract_styles(root: web.html_.HTMLobj, prefix: str = "s") -> Stylesheet:
+    """moves the inline css of every node of the tree into generated classes, one per
+    distinct set of styles, and returns the stylesheet defining them.
+    keep in mind a class is weaker than an inline style against other rules"""
+    sheet = Stylesheet()
+    names: dict[tuple, str] = {}
+    by_css: dict[int, str] = {}  # CSSobj shared by many nodes are only hashed once
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        stack.extend(
+            i for i in reversed(node.contents or ()) if isinstance(i, web.html_.HTMLobj)
+        )
+        css = node.css
+        if not isinstance(css, CSSobj) or not css.styles:
+            continue
+        name = by_css.get(id(css))
+        if name is None:
+            styles = tuple((str(key), str(value)) for key, value in css.styles.items())
+            name = names.get(styles)
+            if name is None:
+                name = names[styles] = f"{prefix}{len(names)}"
+                sheet.add(CSSobj(f".{name}", **dict(styles)))
+            by_css[id(css)] = name
+        node.css = None
+        node.class_ = f"{node.class_} {name}" if node.class_ else name
+    return sheet
+
+
+def hoist_styles(page: web.html_.HTMLobj, prefix: str = "s") -> Stylesheet:
+    "extract_styles for a GetPage document, the stylesheet is added to its <head>"
+    sheet = extract_styles(page, prefix)
+    head = page.find("head") if page.tag != "head" else page
+    if head is not None and len(sheet):
+        head.append(web.html_.HTMLobj("style", None, None, sheet.css(minify=True)))
+    return sheet
+
+
 # feel free to make your own templates
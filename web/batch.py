@@ -0,0 +1,126 @@
+from os import makedirs
+from os.path import dirname, join
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping, NamedTuple, Union
+from web.binary import MappedDocument, dumps
+from web.compact import ArenaDocument
+from web.html_ import HTMLobj
+from web.output import export_chunks
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+# Batch export : renders and writes many pages over a pool of processes. trees travel
+# to the workers encoded by web.binary.dumps (about twice cheaper to produce than a
+# pickle or an ArenaDocument), the workers render them where they lie
+
+
+class PageResult(NamedTuple):
+    name: str
+    path: str
+    size: int  # bytes written
+    seconds: float  # render and write time in the worker
+
+
+Pages = Union[Mapping[str, HTMLobj], Iterable[tuple[str, HTMLobj]]]
+
+
+def _items(pages: Pages) -> Iterable[tuple[str, HTMLobj]]:
+    return pages.items() if isinstance(pages, Mapping) else pages
+
+
+def _job(name: str, tree: HTMLobj, out_dir: str, pretty: bool, encode: bool = True) -> tuple:
+    "the job of a page, its tree encoded for another process unless it is an ArenaDocument"
+    document = dumps(tree) if encode and not isinstance(tree, ArenaDocument) else tree
+    return name, join(out_dir, name), document, pretty
+
+
+def _render_job(job: tuple) -> PageResult:
+    name, path, document, pretty = job
+    start = perf_counter()
+    if isinstance(document, bytes):
+        document = MappedDocument(document)
+    directory = dirname(path)
+    if directory:
+        makedirs(directory, exist_ok=True)
+    size = export_chunks(document.iter_render(pretty, "\t"), path)
+    return PageResult(name, path, size, perf_counter() - start)
+
+
+def iter_render_many(
+    pages: Pages,
+    out_dir: str,
+    workers: int = None,
+    chunksize: int = 8,
+    ordered: bool = True,
+    pretty: bool = True,
+) -> Iterator[PageResult]:
+    """renders every (file name, tree) pair into out_dir over `workers` processes
+    (all the cores by default, 1 renders in this process) and yields the results in
+    the order of the pages, or as they complete when ordered is False"""
+    makedirs(out_dir, exist_ok=True)
+    if workers == 1:  # the trees are rendered as they are
+        for name, tree in _items(pages):
+            yield _render_job(_job(name, tree, out_dir, pretty, encode=False))
+        return
+    from multiprocessing import Pool  # slow to import, not needed by a single worker
+
+    jobs = (_job(name, tree, out_dir, pretty) for name, tree in _items(pages))
+    with Pool(workers) as pool:
+        mapper = pool.imap if ordered else pool.imap_unordered
+        yield from mapper(_render_job, jobs, chunksize)
+
+
+def render_many(
+    pages: Pages,
+    out_dir: str,
+    workers: int = None,
+    chunksize: int = 8,
+    ordered: bool = True,
+    pretty: bool = True,
+) -> list[PageResult]:
+    "same as iter_render_many but waits for every page, pretty output matches HTMLobj.export"
+    return list(iter_render_many(pages, out_dir, workers, chunksize, ordered, pretty))
+
+
+async def render_many_async(
+    pages: Pages,
+    out_dir: str,
+    workers: int = None,
+    pretty: bool = True,
+    executor: "Executor" = None,
+    in_flight: int = None,
+) -> list[PageResult]:
+    """render_many for asyncio code, rendering and file writes happen in the executor
+    (a process pool of `workers` by default) and the trees are encoded in the default
+    thread pool, so the event loop never blocks on them. at most `in_flight` pages
+    (twice the workers by default) are encoded or rendering at a time"""
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+    from os import cpu_count
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, lambda: makedirs(out_dir, exist_ok=True))
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(workers)
+    slots = asyncio.Semaphore(in_flight or 2 * (workers or cpu_count() or 1))
+
+    async def render(name: str, tree: HTMLobj) -> PageResult:
+        try:
+            job = await loop.run_in_executor(None, _job, name, tree, out_dir, pretty)
+            return await loop.run_in_executor(executor, _render_job, job)
+        finally:
+            slots.release()
+
+    tasks = []
+    try:
+        for name, tree in _items(pages):
+            await slots.acquire()
+            tasks.append(asyncio.ensure_future(render(name, tree)))
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
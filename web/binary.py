@@ -0,0 +1,601 @@
+from mmap import ACCESS_READ, mmap
+from sys import intern
+from types import MappingProxyType
+from typing import Any, Iterator, Self, Union
+from web.css import CSSobj
+from web.html_ import HTMLobj, _BATCH_SIZE, _NO_ATTRIBUTES, _RAW_TEXT_ELEMENTS
+from web.markup import Markup, escape
+from web.output import Compression, Sink, write_chunks
+
+# Binary trees : a compact encoding of HTMLobj trees (and their CSSobj) to cache built
+# pages between processes and restarts. the strings of the elements (tags, classes,
+# attribute and style keys and values) are written once in a string table, the
+# identical elements once in an element table, then the nodes follow in preorder as
+# varint records. an element record holds the byte length of its contents so a reader
+# skips whole subtrees, MappedDocument renders and searches a mapped file that way
+#
+#   b"WEBT" version
+#   strings   count, then (byte length, utf-8) each
+#   elements  count, then tag, flags, [class], [selector], [styles], attributes each
+#   nodes     count, then the root record
+#     element  varint(entry << 1), varint(byte length of the contents), contents
+#     text     varint(byte length << 2 | markup << 1 | 1), utf-8
+
+_MAGIC = b"WEBT"
+_VERSION = 1
+
+# element flags
+_SELF_CLOSING, _MEMOIZE, _CLASS, _CSS, _SELECTOR = 1, 2, 4, 8, 16
+
+# the encoding of the small varints, most of them
+_SMALL = [bytes((i,)) for i in range(0x80)]
+
+Buffer = Union[bytes, bytearray, memoryview, mmap]
+
+
+def dumps(tree: HTMLobj) -> bytes:
+    """the tree encoded as bytes. attribute and style values, classes and selectors are
+    stored as their str, the texts as they render : contents that aren't str (numbers,
+    objects with __html__) come back as Markup of their html"""
+    if not isinstance(tree, HTMLobj):
+        raise TypeError(f"only a HTMLobj tree can be dumped, not {type(tree).__name__}")
+    strings: dict[str, int] = {}
+    entries: dict[tuple, int] = {}
+    encoded_entries: list[bytes] = []
+    heads: list[bytes] = []  # the start of the records of each entry
+    styles_keys: dict[int, tuple] = {}  # id(CSSobj) -> its part of the entry keys
+    pieces: list[Any] = []
+    opened: list[tuple[int, int]] = []  # (index of the contents size in pieces, total then)
+    total = count = 0
+    stack: list[Any] = [tree]
+    pop, push, append = stack.pop, stack.append, pieces.append
+    while stack:
+        item = pop()
+        if item is _SUBTREE_END:
+            slot, start = opened.pop()
+            size = _varint(total - start)
+            pieces[slot] = size
+            total += len(size)
+            continue
+        count += 1
+        if type(item) is str or type(item) is Markup:
+            data = item.encode("utf-8", "surrogatepass")
+            head = _varint(len(data) << 2 | (3 if type(item) is Markup else 1))
+            append(head)
+            append(data)
+            total += len(head) + len(data)
+            continue
+        css, attributes = item.css, item.attributes
+        key = (
+            item.tag,
+            item.self_closing,
+            item.memoize,
+            item.class_,
+            None if css is None else _styles_key(css, styles_keys),
+            tuple(attributes.items()) if attributes else (),
+        )
+        try:
+            entry = entries.get(key)
+        except TypeError:  # an unhashable value, the key is made of their str instead
+            key = _str_key(key)
+            entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = len(encoded_entries)
+            encoded_entries.append(_encode_entry(key, strings))
+            heads.append(_varint(entry << 1))
+        head = heads[entry]
+        append(head)
+        total += len(head)
+        contents = item.contents
+        if not contents:
+            append(b"\x00")
+            total += 1
+            continue
+        if len(contents) == 1 and type(contents[0]) is str:
+            # a leaf holding a text, the most common node, written at once
+            data = contents[0].encode("utf-8", "surrogatepass")
+            head = _varint(len(data) << 2 | 1)
+            size = _varint(len(head) + len(data))
+            append(size)
+            append(head)
+            append(data)
+            total += len(size) + len(head) + len(data)
+            count += 1
+            continue
+        append(None)
+        opened.append((len(pieces) - 1, total))
+        push(_SUBTREE_END)
+        raw = item.tag in _RAW_TEXT_ELEMENTS
+        for i in reversed(contents):
+            if isinstance(i, HTMLobj) or type(i) is str:
+                push(i)
+            elif i is not None:
+                # rendered as they are stored, a Lazy raises LazyContentsError here
+                push(str(i) if raw else Markup(escape(i)))
+    header = bytearray(_MAGIC)
+    header.append(_VERSION)
+    _write_varint(header, len(strings))
+    for string in strings:
+        data = string.encode("utf-8", "surrogatepass")
+        _write_varint(header, len(data))
+        header += data
+    _write_varint(header, len(encoded_entries))
+    header += b"".join(encoded_entries)
+    _write_varint(header, count)
+    return b"".join([header, *pieces])
+
+
+def loads(data: Buffer) -> HTMLobj:
+    "builds back the tree dumps encoded"
+    _, entries, _, start = _read_tables(data)
+    try:
+        return _build(data, start, entries)
+    except IndexError:
+        raise ValueError("truncated web binary tree") from None
+
+
+class MappedDocument:
+    """a tree encoded by dumps read where it lies, bytes or a memory mapped file, so a
+    page is rendered or searched without building its nodes. only the string and
+    element tables are decoded when it opens, the texts as they are needed"""
+
+    __slots__ = ("data", "entries", "_count", "_start", "_tags", "_file")
+
+    def __init__(self, data: Buffer) -> None:
+        self.data = data
+        _, self.entries, self._count, self._start = _read_tables(data)
+        self._tags: list[tuple[str, str]] | None = None
+        self._file = None
+
+    @classmethod
+    def open(cls, path: str) -> "MappedDocument":
+        "maps the file read only, close() (or a with block) unmaps it"
+        with open(path, "rb") as file:
+            data = mmap(file.fileno(), 0, access=ACCESS_READ)
+        document = cls(data)
+        document._file = data
+        return document
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def root(self) -> "MappedNode":
+        return MappedNode(self, self._start)
+
+    def tags(self) -> list[tuple[str, str]]:
+        "the start and end tag of every element entry, formatted once by HTMLobj.__tag__"
+        if self._tags is None:
+            self._tags = [_element(entry).__tag__() for entry in self.entries]
+        return self._tags
+
+    def __str__(self) -> str:
+        return "".join(self.iter_render())
+
+    def prettify(self, space: str = "  ") -> str:
+        return "".join(self.iter_render(True, space))
+
+    def iter_render(self, pretty: bool = False, indent: str = "  ") -> Iterator[str]:
+        "yields the same markup as HTMLobj.iter_render would for the stored tree"
+        return self.root.iter_render(pretty, indent)
+
+    def render_into(
+        self,
+        sink: Sink,
+        pretty: bool = False,
+        indent: str = "  ",
+        compress: Compression = None,
+        fill: bool = False,
+    ) -> int:
+        return write_chunks(self.iter_render(pretty, indent), sink, compress, fill=fill)
+
+    def find(
+        self, tag: str, class_: str = None, recursive: bool = False, **attributes: str
+    ) -> Union["MappedNode", None]:
+        return self.root.find(tag, class_, recursive, **attributes)
+
+    def find_all(
+        self, tag: str, class_: str = None, recursive: bool = False, **attributes: str
+    ) -> Iterator["MappedNode"]:
+        return self.root.find_all(tag, class_, recursive, **attributes)
+
+    def to_tree(self) -> HTMLobj:
+        return self.root.to_tree()
+
+
+class MappedNode:
+    "an element of a MappedDocument, read from its record when asked"
+
+    __slots__ = ("document", "offset")
+
+    def __init__(self, document: MappedDocument, offset: int) -> None:
+        self.document = document
+        self.offset = offset  # where its record starts
+
+    def _record(self) -> tuple[tuple, int, int]:
+        "the entry, then where the contents start and end"
+        data = self.document.data
+        value, pos = _read_varint(data, self.offset)
+        size, pos = _read_varint(data, pos)
+        return self.document.entries[value >> 1], pos, pos + size
+
+    @property
+    def tag(self) -> str:
+        return self._record()[0][0]
+
+    @property
+    def class_(self) -> str | None:
+        return self._record()[0][3]
+
+    @property
+    def attributes(self) -> MappingProxyType:
+        return self._record()[0][6]
+
+    @property
+    def css(self) -> CSSobj | None:
+        return _element(self._record()[0]).css
+
+    def children(self) -> Iterator[Union["MappedNode", str]]:
+        "the child elements as MappedNode and the texts (Markup when stored as html)"
+        data = self.document.data
+        _, pos, end = self._record()
+        while pos < end:
+            start = pos
+            value, pos = _read_varint(data, pos)
+            if value & 1:
+                size = value >> 2
+                text = str(data[pos : pos + size], "utf-8", "surrogatepass")
+                yield Markup(text) if value & 2 else text
+            else:
+                size, pos = _read_varint(data, pos)
+                yield MappedNode(self.document, start)
+            pos += size
+
+    __iter__ = children
+
+    def find(
+        self, tag: str, class_: str = None, recursive: bool = False, **attributes: str
+    ) -> Union["MappedNode", None]:
+        return next(self.find_all(tag, class_, recursive, **attributes), None)
+
+    def find_all(
+        self, tag: str, class_: str = None, recursive: bool = False, **attributes: str
+    ) -> Iterator["MappedNode"]:
+        """the child elements (every descendant if recursive) with this tag, class and
+        attributes, the same test as HTMLobj.find_all. texts and the subtrees skipped
+        are never decoded"""
+        document, data = self.document, self.document.data
+        matches = [
+            entry[0] == tag and entry[3] == class_ and entry[6] == attributes
+            for entry in document.entries
+        ]
+        _, pos, end = self._record()
+        while pos < end:
+            start = pos
+            value, pos = _read_varint(data, pos)
+            if value & 1:
+                pos += value >> 2
+                continue
+            size, pos = _read_varint(data, pos)
+            if matches[value >> 1]:
+                yield MappedNode(document, start)
+            if not recursive:
+                pos += size
+
+    def __str__(self) -> str:
+        return "".join(self.iter_render())
+
+    def prettify(self, space: str = "  ") -> str:
+        return "".join(self.iter_render(True, space))
+
+    def iter_render(self, pretty: bool = False, indent: str = "  ") -> Iterator[str]:
+        "yields the same markup as HTMLobj.iter_render would for the stored subtree"
+        data, tags = self.document.data, self.document.tags()
+        raw_entries = [entry[0] in _RAW_TEXT_ELEMENTS for entry in self.document.entries]
+        closing: list[tuple[int, str, bool]] = []  # (end of the contents, end tag, raw)
+        pos, end = self.offset, self._record()[2]
+        raw = False
+        batch: list[str] = []
+        while pos < end:
+            level = len(closing)
+            if pretty and pos != self.offset:
+                batch.append("\n")
+            value = data[pos]
+            pos += 1
+            if value & 0x80:
+                value, pos = _varint_rest(data, pos, value)
+            if value & 1:
+                size = value >> 2
+                text = str(data[pos : pos + size], "utf-8", "surrogatepass")
+                pos += size
+                if not value & 2 and not raw:
+                    text = escape(text)
+                batch.append(f"{indent * level}{text}" if pretty else text)
+            else:
+                entry = value >> 1
+                size = data[pos]
+                pos += 1
+                if size & 0x80:
+                    size, pos = _varint_rest(data, pos, size)
+                startTAG, endTAG = tags[entry]
+                if pretty:
+                    startTAG = f"{indent * level}{startTAG}"
+                    if size:
+                        endTAG = f"\n{indent * level}{endTAG}"
+                if size:
+                    batch.append(startTAG)
+                    closing.append((pos + size, endTAG, raw))
+                    raw = raw_entries[entry]
+                else:
+                    batch.append(f"{startTAG}{endTAG}")
+            while closing and closing[-1][0] == pos:
+                _, endTAG, raw = closing.pop()
+                batch.append(endTAG)
+            if len(batch) >= _BATCH_SIZE:
+                yield "".join(batch)
+                batch = []
+        if batch:
+            yield "".join(batch)
+
+    def to_tree(self) -> HTMLobj:
+        "builds the regular HTMLobj subtree"
+        data = self.document.data
+        return _build(data, self.offset, self.document.entries)
+
+    def __repr__(self) -> str:
+        return f"MappedNode({self.tag!r} at {self.offset})"
+
+
+_SUBTREE_END = object()
+
+
+def _varint(value: int) -> bytes:
+    if value < 0x80:
+        return _SMALL[value]
+    out = bytearray()
+    _write_varint(out, value)
+    return bytes(out)
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: Buffer, pos: int) -> tuple[int, int]:
+    value = data[pos]
+    if value & 0x80:
+        return _varint_rest(data, pos + 1, value)
+    return value, pos + 1
+
+
+def _varint_rest(data: Buffer, pos: int, first: int) -> tuple[int, int]:
+    "the varint whose first byte (with more to come) was already read"
+    value, shift = first & 0x7F, 7
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _styles_key(css: Any, styles_keys: dict[int, tuple]) -> tuple | None:
+    "the part of the entry keys made of a CSSobj, built once for a CSSobj shared by nodes"
+    if not isinstance(css, CSSobj):
+        return None  # not rendered either
+    styles = styles_keys.get(id(css))
+    if styles is None:
+        selector = css.selector
+        styles = styles_keys[id(css)] = (
+            None if selector is None else str(selector),
+            tuple((str(k), str(v)) for k, v in (css.styles or {}).items()),
+        )
+    return styles
+
+
+def _str_key(key: tuple) -> tuple:
+    tag, self_closing, memoize, class_, styles, attributes = key
+    return (
+        tag,
+        self_closing,
+        memoize,
+        None if class_ is None else str(class_),
+        styles,
+        tuple((str(k), str(v)) for k, v in attributes),
+    )
+
+
+def _encode_entry(key: tuple, strings: dict[str, int]) -> bytes:
+    tag, self_closing, memoize, class_, styles, attributes = key
+    flags = _SELF_CLOSING if self_closing else 0
+    if memoize:
+        flags |= _MEMOIZE
+    if class_ is not None:
+        flags |= _CLASS
+    if styles is not None:
+        flags |= _CSS | (_SELECTOR if styles[0] is not None else 0)
+    out = bytearray()
+    _write_varint(out, strings.setdefault(str(tag), len(strings)))
+    out.append(flags)
+    if class_ is not None:
+        _write_varint(out, strings.setdefault(str(class_), len(strings)))
+    if styles is not None:
+        selector, items = styles
+        if selector is not None:
+            _write_varint(out, strings.setdefault(selector, len(strings)))
+        _write_varint(out, len(items))
+        for k, v in items:
+            _write_varint(out, strings.setdefault(k, len(strings)))
+            _write_varint(out, strings.setdefault(v, len(strings)))
+    _write_varint(out, len(attributes))
+    for k, v in attributes:
+        _write_varint(out, strings.setdefault(str(k), len(strings)))
+        _write_varint(out, strings.setdefault(str(v), len(strings)))
+    return bytes(out)
+
+
+def _read_tables(data: Buffer) -> tuple[list[str], list[tuple], int, int]:
+    """the strings, the element entries, the node count and the offset of the root.
+    an entry is (tag, self closing, memoize, class, selector, styles, attributes), the
+    styles and attributes as read only maps shared by the nodes built from it"""
+    if data[:4] != _MAGIC:
+        raise ValueError("not a web binary tree")
+    if data[4] != _VERSION:
+        raise ValueError(f"unsupported web binary tree version {data[4]}")
+    try:
+        count, pos = _read_varint(data, 5)
+        strings = []
+        for _ in range(count):
+            size, pos = _read_varint(data, pos)
+            strings.append(str(data[pos : pos + size], "utf-8", "surrogatepass"))
+            pos += size
+        count, pos = _read_varint(data, pos)
+        entries = []
+        for _ in range(count):
+            index, pos = _read_varint(data, pos)
+            tag = intern(strings[index])
+            flags = data[pos]
+            pos += 1
+            class_ = selector = styles = None
+            if flags & _CLASS:
+                index, pos = _read_varint(data, pos)
+                class_ = strings[index]
+            if flags & _CSS:
+                if flags & _SELECTOR:
+                    index, pos = _read_varint(data, pos)
+                    selector = strings[index]
+                styles, pos = _read_map(data, pos, strings)
+            attributes, pos = _read_map(data, pos, strings)
+            entries.append(
+                (
+                    tag,
+                    bool(flags & _SELF_CLOSING),
+                    bool(flags & _MEMOIZE),
+                    class_,
+                    selector,
+                    styles,
+                    attributes,
+                )
+            )
+        nodes, pos = _read_varint(data, pos)
+    except IndexError:
+        raise ValueError("truncated web binary tree") from None
+    return strings, entries, nodes, pos
+
+
+def _read_map(data: Buffer, pos: int, strings: list[str]) -> tuple[MappingProxyType, int]:
+    count, pos = _read_varint(data, pos)
+    if not count:
+        return _NO_ATTRIBUTES, pos
+    items = {}
+    for _ in range(count):
+        key, pos = _read_varint(data, pos)
+        value, pos = _read_varint(data, pos)
+        items[strings[key]] = strings[value]
+    return MappingProxyType(items), pos
+
+
+def _element(entry: tuple, parent: HTMLobj = None) -> HTMLobj:
+    "a node without contents built from its entry, with maps of its own"
+    tag, self_closing, memoize, class_, selector, styles, attributes = entry
+    node = HTMLobj.__new__(HTMLobj)
+    set_ = object.__setattr__
+    set_(node, "_parent", parent)
+    set_(node, "_clean", False)
+    set_(node, "_index", None)
+    set_(node, "_rendered", None)
+    set_(node, "_hash", None)
+    set_(node, "_start", None)
+    set_(node, "memoize", memoize)
+    set_(node, "tag", tag)
+    set_(node, "css", None if styles is None else _css(selector, styles))
+    set_(node, "class_", class_)
+    set_(node, "contents", [])
+    set_(node, "attributes", dict(attributes))
+    set_(node, "self_closing", self_closing)
+    return node
+
+
+def _css(selector: str | None, styles: MappingProxyType) -> CSSobj:
+    css = CSSobj.__new__(CSSobj)
+    css.__setstate__({"selector": selector, "styles": dict(styles)})
+    return css
+
+
+def _build(data: Buffer, pos: int, entries: list[tuple]) -> HTMLobj:
+    "the subtree whose record starts at pos"
+    set_, new = object.__setattr__, HTMLobj.__new__
+    value, pos = _read_varint(data, pos)
+    size, pos = _read_varint(data, pos)
+    root = _element(entries[value >> 1])
+    if not size:
+        return root
+    # (node, its contents, where they end)
+    opened: list[tuple[HTMLobj, list, int]] = [(root, [], pos + size)]
+    node, contents, stop = opened[-1]
+    while opened:
+        value = data[pos]
+        pos += 1
+        if value & 0x80:
+            value, pos = _varint_rest(data, pos, value)
+        if value & 1:
+            size = value >> 2
+            text = str(data[pos : pos + size], "utf-8", "surrogatepass")
+            contents.append(Markup(text) if value & 2 else text)
+            pos += size
+        else:
+            size = data[pos]
+            pos += 1
+            if size & 0x80:
+                size, pos = _varint_rest(data, pos, size)
+            # _element inlined, it runs for most of the records
+            tag, self_closing, memoize, class_, selector, styles, attributes = entries[value >> 1]
+            child = new(HTMLobj)
+            set_(child, "_parent", node)
+            set_(child, "_clean", False)
+            set_(child, "_index", None)
+            set_(child, "_rendered", None)
+            set_(child, "_hash", None)
+            set_(child, "_start", None)
+            set_(child, "memoize", memoize)
+            set_(child, "tag", tag)
+            set_(child, "css", None if styles is None else _css(selector, styles))
+            set_(child, "class_", class_)
+            set_(child, "attributes", dict(attributes))
+            set_(child, "self_closing", self_closing)
+            contents.append(child)
+            head = data[pos] if size else 0
+            if not size:
+                set_(child, "contents", [])
+            elif head & 1 and head < 0x80 and (head >> 2) + 1 == size:
+                # a leaf holding a text, taken at once
+                text = str(data[pos + 1 : pos + size], "utf-8", "surrogatepass")
+                set_(child, "contents", [Markup(text) if head & 2 else text])
+                pos += size
+            else:
+                opened.append((child, [], pos + size))
+                node, contents, stop = opened[-1]
+        while pos == stop:
+            set_(node, "contents", contents)
+            opened.pop()
+            if not opened:
+                break
+            node, contents, stop = opened[-1]
+    if pos > len(data):  # the last text was cut
+        raise IndexError
+    return root
@@ -0,0 +1,279 @@
+from array import array
+from collections import Counter
+from collections.abc import Mapping, MutableMapping
+from sys import intern
+from types import MappingProxyType
+from typing import Any, Iterable, Iterator, Union
+from web.css import CSSobj, _NO_STYLES
+from web.html_ import HTMLobj, _NO_ATTRIBUTES, _RAW_TEXT_ELEMENTS
+from web.markup import Markup, escape
+
+# Memory lean storage for very large trees : tuple backed attribute / style maps,
+# a compaction pass over HTMLobj trees, the sharing of identical subtrees and a read
+# only document kept in flat arrays
+
+
+class Attributes(MutableMapping):
+    """a small mapping stored as one flat (key, value, key, value...) tuple, far
+    lighter than a dict for the handful of attributes or styles most nodes have"""
+
+    __slots__ = ("_items",)
+
+    def __init__(self, items: Union[Mapping, Iterable[tuple[str, Any]]] = ()) -> None:
+        flat = []
+        for key, value in items.items() if isinstance(items, Mapping) else items:
+            flat += (intern(key) if type(key) is str else key, value)
+        self._items = tuple(flat)
+
+    def __getitem__(self, key: str) -> Any:
+        items = self._items
+        for i in range(0, len(items), 2):
+            if items[i] == key:
+                return items[i + 1]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        items = self._items
+        for i in range(0, len(items), 2):
+            if items[i] == key:
+                self._items = (*items[: i + 1], value, *items[i + 2 :])
+                return
+        self._items = (*items, intern(key) if type(key) is str else key, value)
+
+    def __delitem__(self, key: str) -> None:
+        items = self._items
+        for i in range(0, len(items), 2):
+            if items[i] == key:
+                self._items = items[:i] + items[i + 2 :]
+                return
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items[::2])
+
+    def __len__(self) -> int:
+        return len(self._items) // 2
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items[::2]
+
+    def __repr__(self) -> str:
+        return f"Attributes({dict(self)})"
+
+
+def compact(root: HTMLobj, small: int = 4) -> HTMLobj:
+    """shrinks a built tree in place : tags and keys get interned, empty containers are
+    replaced by the shared ones and maps of up to `small` entries become Attributes"""
+    # the output stays the same, the fields are set without the per node tracking of
+    # __setattr__ (a walk up the tree each) and the tree is invalidated once at the end
+    set_ = object.__setattr__
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if type(node.tag) is str:
+            set_(node, "tag", intern(node.tag))
+        contents = node.contents
+        if not contents:
+            set_(node, "contents", ())
+        elif isinstance(contents, list):
+            set_(node, "contents", list(contents))  # a copy drops the over allocation of append
+        attributes = node.attributes
+        if not attributes:
+            set_(node, "attributes", _NO_ATTRIBUTES)
+        elif len(attributes) <= small and not isinstance(attributes, Attributes):
+            set_(node, "attributes", Attributes(attributes))
+        if isinstance(node.css, CSSobj):
+            styles = node.css.styles
+            if not styles:
+                set_(node.css, "styles", _NO_STYLES)
+            elif len(styles) <= small and not isinstance(styles, Attributes):
+                set_(node.css, "styles", Attributes(styles))
+        stack.extend(i for i in node.contents if isinstance(i, HTMLobj))
+    root.invalidate()
+    return root
+
+
+def share_subtrees(root: HTMLobj, memoize: bool = True) -> HTMLobj:
+    """hash consing : the subtrees with the same content_hash are replaced by one shared
+    node, memoized so its html is rendered once for all its places, and the equal
+    attribute and style maps left become one read only map (swapped on write).
+    a shared node is linked to the parent of each of its places, editing it changes
+    them all. the tree index needs every node at one place, so select() and
+    find_all(recursive=True) raise ValueError on a shared tree, search before sharing"""
+    root.content_hash()
+    counts = Counter()
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        counts[node._hash] += 1
+        stack.extend(i for i in node.contents or () if isinstance(i, HTMLobj))
+    set_ = object.__setattr__
+    shared: dict[str, HTMLobj] = {root._hash: root}
+    maps: dict[tuple, MappingProxyType] = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        # the output stays the same, the caches (and hashes) of the tree stay valid
+        attributes, css = node.attributes, node.css
+        if attributes is not None and type(attributes) is not MappingProxyType:
+            set_(node, "attributes", _shared_map(maps, attributes) if attributes else _NO_ATTRIBUTES)
+        styles = css.styles if isinstance(css, CSSobj) else None
+        if styles is not None and type(styles) is not MappingProxyType:
+            set_(css, "styles", _shared_map(maps, styles) if styles else _NO_STYLES)
+        contents = node.contents
+        for index, child in enumerate(contents or ()):
+            if not isinstance(child, HTMLobj):
+                continue
+            first = shared.setdefault(child._hash, child)
+            if first is not child:
+                if type(contents) is not list:
+                    contents = list(contents)
+                    set_(node, "contents", contents)
+                contents[index] = first
+                first._adopted_by(node)  # its changes reach every place it is at
+                continue
+            if memoize and counts[child._hash] > 1:
+                child.memoize = True
+            stack.append(child)
+    set_(root._root(), "_index", None)  # the index still lists the dropped copies
+    return root
+
+
+def _shared_map(maps: dict[tuple, MappingProxyType], mapping: Mapping) -> Mapping:
+    try:
+        key = tuple(mapping.items())
+        shared = maps.get(key)
+    except TypeError:  # an unhashable value, the map stays its own
+        return mapping
+    if shared is None:
+        shared = maps[key] = MappingProxyType(dict(key))
+    return shared
+
+
+class ArenaDocument:
+    """a read only document where nodes are indices into parallel arrays, in preorder.
+    kinds holds the element entry of a node or -(text number + 1) for a text (kept
+    escaped, as rendered), sizes the count of its descendants. identical elements
+    (tag, css, class, attributes) share one entry so repeated rows cost a few bytes
+    per node"""
+
+    __slots__ = ("kinds", "sizes", "texts", "elements", "_tags")
+
+    def __init__(self, root: HTMLobj) -> None:
+        self.kinds = array("i")
+        self.sizes = array("i")
+        self.texts: list[str] = []
+        self.elements: list[tuple] = []
+        self._tags: list[tuple[str, str]] | None = None
+        entries: dict[tuple, int] = {}
+        kinds, sizes, texts = self.kinds, self.sizes, self.texts
+        stack: list = [root]
+        opened: list[int] = []
+        while stack:
+            item = stack.pop()
+            if item is _SUBTREE_END:
+                start = opened.pop()
+                sizes[start] = len(kinds) - start - 1
+                continue
+            if not isinstance(item, HTMLobj):
+                kinds.append(-len(texts) - 1)
+                sizes.append(0)
+                texts.append(item)  # escaped as it was pushed
+                continue
+            element = _element_entry(item)
+            try:
+                entry = entries.setdefault(element, len(self.elements))
+            except TypeError:  # an unhashable attribute value, the element gets its own entry
+                entry = len(self.elements)
+            if entry == len(self.elements):
+                self.elements.append(element)
+            kinds.append(entry)
+            sizes.append(0)
+            opened.append(len(kinds) - 1)
+            stack.append(_SUBTREE_END)
+            raw = item.tag in _RAW_TEXT_ELEMENTS
+            stack.extend(
+                i if isinstance(i, HTMLobj) else str(i) if raw else escape(i)
+                for i in reversed(item.contents or ())
+                if i is not None
+            )
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __str__(self) -> str:
+        return "".join(self.iter_render())
+
+    def prettify(self, space: str = "  ") -> str:
+        return "".join(self.iter_render(True, space))
+
+    def tags(self) -> list[tuple[str, str]]:
+        "the start and end tag of every element entry, formatted once by HTMLobj.__tag__"
+        if self._tags is None:
+            self._tags = [_shell(element).__tag__() for element in self.elements]
+        return self._tags
+
+    def iter_render(self, pretty: bool = False, indent: str = "  ") -> Iterator[str]:
+        "yields the same markup as HTMLobj.iter_render would for the original tree"
+        kinds, sizes, texts, tags = self.kinds, self.sizes, self.texts, self.tags()
+        closing: list[tuple[int, str]] = []  # (last node of the subtree, end tag)
+        for i in range(len(kinds)):
+            kind = kinds[i]
+            level = len(closing)
+            if pretty and i:
+                yield "\n"
+            if kind < 0:
+                yield f"{indent * level}{texts[-kind - 1]}" if pretty else texts[-kind - 1]
+            else:
+                startTAG, endTAG = tags[kind]
+                if pretty:
+                    startTAG = f"{indent * level}{startTAG}"
+                    if sizes[i]:
+                        endTAG = f"\n{indent * level}{endTAG}"
+                if sizes[i]:
+                    yield startTAG
+                    closing.append((i + sizes[i], endTAG))
+                else:
+                    yield f"{startTAG}{endTAG}"
+            while closing and closing[-1][0] == i:
+                yield closing.pop()[1]
+
+    def to_tree(self) -> HTMLobj:
+        "rebuilds a regular HTMLobj tree"
+        kinds, sizes, texts = self.kinds, self.sizes, self.texts
+        nodes: list[HTMLobj] = []
+        closing: list[int] = []
+        root = None
+        for i in range(len(kinds)):
+            kind = kinds[i]
+            content = Markup(texts[-kind - 1]) if kind < 0 else _shell(self.elements[kind])
+            if nodes:
+                nodes[-1].add(content)
+            else:
+                root = content
+            if kind >= 0 and sizes[i]:
+                nodes.append(content)
+                closing.append(i + sizes[i])
+            while closing and closing[-1] == i:
+                closing.pop()
+                nodes.pop()
+        return root
+
+
+_SUBTREE_END = object()
+
+
+def _element_entry(node: HTMLobj) -> tuple:
+    css = node.css
+    styles = tuple(css.styles.items()) if isinstance(css, CSSobj) else None
+    attributes = tuple((node.attributes or {}).items())
+    return (node.tag, styles, node.class_, attributes)
+
+
+def _shell(element: tuple) -> HTMLobj:
+    "an element without contents built back from its entry"
+    tag, styles, class_, attributes = element
+    node = HTMLobj(tag, None if styles is None else CSSobj(**dict(styles)), class_)
+    if attributes:
+        node.attributes = dict(attributes)
+    return node
@@ -1,21 +1,82 @@
+from types import MappingProxyType
 from typing import Any, Iterator, Self
+from weakref import WeakSet
+from web.markup import escape_attribute
+from web.output import Compression, Sink, export_chunks, write_chunks
 
 
 # Added basic css object functionality : 18/08/2025
 
+# shared by the CSSobj compact() shrinks, __setitem__ replaces it before writing
+_NO_STYLES = MappingProxyType({})
+
 
 class CSSobj:
     "this class handles the behavior of a css elements"
 
-    __slots__ = ("styles", "selector")
+    __slots__ = ("styles", "selector", "_owners", "_hash", "_attribute")
 
     def __init__(self, selector: str = None, **styles: str) -> None:
         # styles support any class that has a __str__ dunder function and same for selector
-        self.selector = selector
-        self.styles = styles
+        set_ = object.__setattr__
+        set_(self, "selector", selector)
+        set_(self, "styles", styles)
+        set_(self, "_owners", None)  # the html objects whose cached output shows these styles
+        set_(self, "_hash", None)
+        set_(self, "_attribute", None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        if name == "styles" or name == "selector":
+            self._changed()
+
+    def _watch(self, owner: Any) -> None:
+        if self._owners is None:
+            self._owners = WeakSet()
+        self._owners.add(owner)
+
+    def _changed(self) -> None:
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_attribute", None)
+        for owner in list(self._owners or ()):
+            owner._touch()
+
+    def __getstate__(self) -> dict:
+        styles = self.styles
+        return {
+            "styles": dict(styles) if type(styles) is MappingProxyType else styles,
+            "selector": self.selector,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        set_ = object.__setattr__
+        set_(self, "selector", state["selector"])
+        set_(self, "styles", state["styles"])
+        set_(self, "_owners", None)
+        set_(self, "_hash", None)
+        set_(self, "_attribute", None)
+
+    def __eq__(self, value: Any) -> bool:
+        "same selector and same styles in the same order, compared through the hashes"
+        if not isinstance(value, CSSobj):
+            return NotImplemented
+        return self is value or self.content_hash() == value.content_hash()
+
+    __hash__ = None  # mutable, content_hash() is the key to use
+
+    def content_hash(self) -> str:
+        "a hash of the selector and the styles, cached until they change"
+        if self._hash is None:
+            from hashlib import blake2b
 
-    def __eq__(self, value):
-        return self.styles == value
+            selector, styles = self.selector, self.styles
+            key = (
+                None if selector is None else str(selector),
+                [(str(k), str(v)) for k, v in styles.items()] if styles else None,
+            )
+            digest = blake2b(repr(key).encode("utf-8", "surrogatepass"), digest_size=16)
+            object.__setattr__(self, "_hash", digest.hexdigest())
+        return self._hash
 
     def __str__(self) -> str:
         return f"<{self.styles or 'Empty'}>"
@@ -30,12 +91,18 @@ class CSSobj:
         return self.styles[key]
 
     def __setitem__(self, key: str, value: str) -> None:
+        if type(self.styles) is MappingProxyType or self.styles is None:
+            # a shared read only map is copied first, the owners are notified below
+            object.__setattr__(self, "styles", dict(self.styles or ()))
         self.styles[key] = value
+        self._changed()
 
     def __contains__(self, value: str) -> bool:
         return value in self.styles
 
     def __getattr__(self, style: str) -> Any:
+        if style.startswith("_"):
+            raise AttributeError(style)  # copy / pickle probe for dunder methods
         return self[style]
 
     def __enter__(self) -> Self:
@@ -58,13 +125,185 @@ class CSSobj:
         styles = [f"{style}: {self.styles[style]};" for style in self.styles]
         return " ".join(styles)
 
-    def export(self, css_filepath: str, append: bool = False) -> None:
-        "export the css data to a .css file, via appending or rewriting a file completly"
-        mode = "w" if not append else "a"
-        try:
-            with open(css_filepath, mode, encoding="utf-8") as f:
-                f.write(self.css())
-        except PermissionError:
-            print("couldn't continue the process due to lack of permission")
-        except IOError as e:
-            print("couldn't continue the process due to %s", e)
+    def _style_attribute(self) -> str:
+        "the escaped inline css attribute of the html objects, kept until the styles change"
+        if self._attribute is None:
+            inline = " ".join([f"{key}: {value};" for key, value in self.styles.items()])
+            if '"' in inline or "&" in inline or "<" in inline or ">" in inline:
+                inline = escape_attribute(inline)
+            object.__setattr__(self, "_attribute", f' style="{inline}"')
+        return self._attribute
+
+    def export(self, css_filepath: str, append: bool = False) -> int:
+        """export the css data to a .css file, via appending or rewriting a file completly,
+        returns the bytes written. OSError (permission, disk full...) is raised"""
+        return export_chunks((self.css(),), css_filepath, append)
+
+
+# Added stylesheets, collections of rules written in one go
+
+# a shorthand and its longhands (margin, margin-top...) override each other, so their
+# order is kept as one property family. these first words join another family
+_FAMILY_OF = {
+    "top": "inset",
+    "right": "inset",
+    "bottom": "inset",
+    "left": "inset",
+    "row": "gap",
+    "column": "gap",
+    "align": "place",
+    "justify": "place",
+}
+_families: dict[str, str] = {}
+
+
+def _family(name: str) -> str:
+    "margin-top -> margin, -webkit-border-radius -> border, custom properties stay apart"
+    family = _families.get(name)
+    if family is None:
+        if name.startswith("--"):
+            family = name
+        else:
+            words = name.split("-")
+            word = words[2] if name.startswith("-") and len(words) > 2 else words[0]  # vendor prefix
+            family = _FAMILY_OF.get(word, word)
+        _families[name] = family
+    return family
+
+
+class _Section:
+    "the rules of one media query (or of the top level) in cascade order"
+
+    __slots__ = ("blocks", "by_selector", "last_block")
+
+    def __init__(self) -> None:
+        self.blocks: list[tuple[str, dict[str, str]]] = []
+        self.by_selector: dict[str, int] = {}  # selector -> its latest block
+        self.last_block: dict[str, int] = {}  # property family -> latest block declaring it
+
+    def add(self, selector: str, styles: dict[str, str]) -> None:
+        # merging into the earlier block of the selector moves the declarations up,
+        # it is only done when no block in between declares the same property families
+        last_block = self.last_block
+        families = [_family(i) for i in styles]
+        position = self.by_selector.get(selector)
+        if position is None or any(last_block.get(i, -1) > position for i in families):
+            position = len(self.blocks)
+            self.blocks.append((selector, {}))
+            self.by_selector[selector] = position
+        declarations = self.blocks[position][1]
+        for key, value in styles.items():
+            declarations.pop(key, None)  # a redefinition takes the place of the last one
+            declarations[key] = value
+        for family in families:
+            if last_block.get(family, -1) < position:
+                last_block[family] = position
+
+    def groups(self) -> list[tuple[list[str], tuple[tuple[str, str], ...]]]:
+        "joins the selectors with identical declarations under the same cascade rule"
+        groups: list[tuple[list[str], tuple[tuple[str, str], ...]]] = []
+        members: list[set[str]] = []  # the selectors of each group, for the lookups
+        by_block: dict[tuple, int] = {}
+        last_group: dict[str, int] = {}
+        for selector, declarations in self.blocks:
+            if not declarations:
+                continue
+            block = tuple(declarations.items())
+            families = {_family(i) for i in declarations}
+            position = by_block.get(block)
+            if position is None or any(last_group.get(i, -1) > position for i in families):
+                position = len(groups)
+                groups.append(([], block))
+                members.append(set())
+                by_block[block] = position
+            if selector not in members[position]:
+                members[position].add(selector)
+                groups[position][0].append(selector)
+            for family in families:
+                if last_group.get(family, -1) < position:
+                    last_group[family] = position
+        return groups
+
+
+class Stylesheet:
+    """a collection of CSSobj rules, rules sharing a selector get merged and selectors
+    sharing a declaration block get grouped, as long as the cascade stays the same"""
+
+    __slots__ = ("_sections", "_rules", "_raw_bytes")
+
+    def __init__(self, *rules: CSSobj) -> None:
+        self._sections: dict[str | None, _Section] = {None: _Section()}
+        self._rules = 0
+        self._raw_bytes = 0
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule: CSSobj, media: str = None) -> None:
+        "adds a rule, inside a media query like `(max-width: 600px)` if media is given"
+        if not rule.selector:
+            raise ValueError("You must have a selector defined to add a rule to a stylesheet")
+        section = self._sections.get(media)
+        if section is None:
+            section = self._sections[media] = _Section()
+        styles = {str(key): str(value) for key, value in rule.styles.items()}
+        section.add(str(rule.selector), styles)
+        self._rules += 1
+        # the size the rule would have once written alone with CSSobj.css
+        self._raw_bytes += len(rule.css().encode("utf-8")) + 1
+
+    def extend(self, rules: Iterator[CSSobj], media: str = None) -> None:
+        for rule in rules:
+            self.add(rule, media)
+
+    def __len__(self) -> int:
+        return self._rules
+
+    def iter_css(self, minify: bool = False) -> Iterator[str]:
+        "yields the stylesheet rule by rule"
+        for media, section in self._sections.items():
+            groups = section.groups()
+            if not groups:
+                continue
+            margin = "" if media is None or minify else "    "
+            if media is not None:
+                yield f"@media {media}{{" if minify else f"@media {media} {{\n"
+            for selectors, block in groups:
+                if minify:
+                    declarations = ";".join(f"{key}:{value}" for key, value in block)
+                    yield f"{','.join(selectors)}{{{declarations}}}"
+                    continue
+                declarations = "\n".join(f"{margin}    {key}: {value};" for key, value in block)
+                yield f"{margin}{', '.join(selectors)} {{\n{declarations}\n{margin}}}\n"
+            if media is not None:
+                yield "}" if minify else "}\n"
+
+    def css(self, minify: bool = False) -> str:
+        return "".join(self.iter_css(minify))
+
+    def stats(self) -> dict[str, int]:
+        "how much the merging saved compared to writing every rule alone"
+        size = sum(len(i.encode("utf-8")) for i in self.iter_css(True))
+        return {
+            "rules": self._rules,
+            "blocks": sum(len(i.groups()) for i in self._sections.values()),
+            "raw_bytes": self._raw_bytes,
+            "bytes": size,
+            "saved_bytes": self._raw_bytes - size,
+        }
+
+    def render_into(
+        self, sink: Sink, minify: bool = False, compress: Compression = None, fill: bool = False
+    ) -> int:
+        "writes the stylesheet as utf-8 into a bytes sink, see web.output.ByteWriter"
+        return write_chunks(self.iter_css(minify), sink, compress, fill=fill)
+
+    def export(
+        self,
+        css_filepath: str,
+        append: bool = False,
+        minify: bool = False,
+        compress: Compression = None,
+    ) -> int:
+        """export the whole stylesheet to a .css file with a single open and buffered writes,
+        returns the bytes written. OSError (permission, disk full...) is raised"""
+        return export_chunks(self.iter_css(minify), css_filepath, append, compress)
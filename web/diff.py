@@ -0,0 +1,267 @@
+import json
+from bisect import bisect_left
+from typing import Any, NamedTuple
+from web.css import CSSobj
+from web.html_ import HTMLobj
+from web.markup import escape
+
+# Tree diffing : the patches turning one HTMLobj tree into another, for pushing
+# deltas to a browser instead of whole pages.
+# a path is the list of child indices from the root, counting every non None item of
+# contents (texts included). patches are meant to be applied in order, each path is
+# valid in the tree as left by the patches before it :
+#   insert         path of the new child, value is its html (escaped for a text)
+#   remove         path of the child to remove
+#   move           path of the child to move, value is its index once taken out
+#   replace        path of a node to swap, value is the html of the new one
+#   set-attribute  name and value of an attribute (class included), None removes it
+#   set-style      name and value of an inline style, None removes it
+#   set-text       value is the new text of the child, not escaped
+
+
+class Patch(NamedTuple):
+    op: str
+    path: tuple[int, ...]
+    name: str | None = None
+    value: Any = None
+
+    def to_list(self) -> list:
+        "the compact form used in json : [op, path, name, value] without the unused fields"
+        if self.op in ("set-attribute", "set-style"):
+            return [self.op, list(self.path), self.name, self.value]
+        if self.op == "remove":
+            return [self.op, list(self.path)]
+        return [self.op, list(self.path), self.value]
+
+
+def patches_to_json(patches: list[Patch]) -> str:
+    return json.dumps([i.to_list() for i in patches], separators=(",", ":"))
+
+
+def _children(node: HTMLobj) -> list:
+    return [i for i in node.contents or () if i is not None]
+
+
+def _parsed_items(content: Any) -> list:
+    "the children parsed markup stands for : its nodes one by one, a text as one string"
+    items = content if isinstance(content, list) else [content]
+    if all(isinstance(i, str) for i in items):
+        return ["".join(items)]
+    return items
+
+
+def _keys(children: list) -> list[tuple]:
+    """elements with a key (or else id) attribute are matched by it, the other children
+    by their tag and rank among the unkeyed children of that tag (texts share one rank)"""
+    keys, ranks = [], {}
+    for child in children:
+        if isinstance(child, HTMLobj):
+            attributes = child.attributes or {}
+            key = attributes.get("key", attributes.get("id"))
+            if key is not None:
+                keys.append(("key", child.tag, str(key)))
+                continue
+            tag = child.tag
+        else:
+            tag = None
+        rank = ranks.get(tag, 0)
+        ranks[tag] = rank + 1
+        keys.append(("rank", tag, rank))
+    return keys
+
+
+def _stable(sequence: list[int]) -> set[int]:
+    "the values of a longest increasing subsequence, those children never need to move"
+    tails: list[int] = []  # smallest tail value of the increasing runs of each length
+    tail_at: list[int] = []  # position in sequence of those tails
+    previous = [-1] * len(sequence)
+    for i, value in enumerate(sequence):
+        length = bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_at.append(i)
+        else:
+            tails[length] = value
+            tail_at[length] = i
+        previous[i] = tail_at[length - 1] if length else -1
+    stable, i = set(), tail_at[-1] if tail_at else -1
+    while i != -1:
+        stable.add(sequence[i])
+        i = previous[i]
+    return stable
+
+
+def _moves(target: list[int]) -> list[tuple[int, int]]:
+    """the (position, destination) moves sorting the increasing old indices into target.
+    from right to left every child off the longest increasing run goes right before its
+    next sibling in target, so its final place is known up front : just before the next
+    stable child (its anchor), after the children moved there already. positions are
+    counted with a Fenwick tree over those places, O(n log n) even for a reversal"""
+    stable = _stable(target)
+    places, anchor = {}, float("inf")  # old index -> (start place, final place)
+    for k in range(len(target) - 1, -1, -1):
+        j = target[k]
+        if j in stable:
+            anchor = j
+        else:
+            places[j] = (j, 0, 0), (anchor, -1, k)
+    order = sorted({*((j, 0, 0) for j in target), *(i[1] for i in places.values())})
+    rank = {place: i + 1 for i, place in enumerate(order)}
+    tree = [0] * (len(order) + 1)
+
+    def add(i: int, value: int) -> None:
+        while i < len(tree):
+            tree[i] += value
+            i += i & -i
+
+    def before(i: int) -> int:
+        total, i = 0, i - 1
+        while i:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    for j in target:
+        add(rank[j, 0, 0], 1)
+    moves = []
+    for k in range(len(target) - 1, -1, -1):
+        if target[k] in places:
+            start, final = places[target[k]]
+            moves.append((before(rank[start]), before(rank[final]) - (rank[final] > rank[start])))
+            add(rank[start], -1)
+            add(rank[final], 1)
+    return moves
+
+
+def _diff_node(old: HTMLobj, new: HTMLobj, path: tuple, patches: list) -> None:
+    "the attribute and style patches of a matched element"
+    if str(old.class_ or "") != str(new.class_ or ""):
+        patches.append(Patch("set-attribute", path, "class", str(new.class_) if new.class_ else None))
+    old_attributes, new_attributes = old.attributes or {}, new.attributes or {}
+    for key, value in new_attributes.items():
+        if key not in old_attributes or str(old_attributes[key]) != str(value):
+            patches.append(Patch("set-attribute", path, key, str(value)))
+    for key in old_attributes:
+        if key not in new_attributes:
+            patches.append(Patch("set-attribute", path, key, None))
+    old_styles = old.css.styles if isinstance(old.css, CSSobj) and old.css.styles else {}
+    new_styles = new.css.styles if isinstance(new.css, CSSobj) and new.css.styles else {}
+    for key, value in new_styles.items():
+        if key not in old_styles or str(old_styles[key]) != str(value):
+            patches.append(Patch("set-style", path, key, str(value)))
+    for key in old_styles:
+        if key not in new_styles:
+            patches.append(Patch("set-style", path, key, None))
+
+
+def diff(old: HTMLobj, new: HTMLobj) -> list[Patch]:
+    "the patches turning the old tree into the new one, in about linear time"
+    patches: list[Patch] = []
+    if old.tag != new.tag:
+        return [Patch("replace", (), None, str(new))]
+    stack = [(old, new, ())]
+    while stack:
+        old, new, path = stack.pop()
+        _diff_node(old, new, path, patches)
+        old_children, new_children = _children(old), _children(new)
+        old_index = {}
+        for i, key in enumerate(_keys(old_children)):
+            old_index.setdefault(key, i)
+        matches = [old_index.get(key) for key in _keys(new_children)]
+        used = set()
+        for i, match in enumerate(matches):
+            if match is not None and match not in used:
+                used.add(match)
+            else:
+                matches[i] = None  # a duplicated key only matches once
+        for j in range(len(old_children) - 1, -1, -1):
+            if j not in used:
+                patches.append(Patch("remove", (*path, j)))
+        # reorder the kept children, the ones on the longest increasing run stay put
+        current = [j for j in range(len(old_children)) if j in used]
+        target = [j for j in matches if j is not None]
+        if current != target:
+            patches.extend(Patch("move", (*path, i), None, j) for i, j in _moves(target))
+        for i, match in enumerate(matches):
+            child = new_children[i]
+            if match is None:
+                html = str(child) if isinstance(child, HTMLobj) else escape(child)
+                patches.append(Patch("insert", (*path, i), None, html))
+                continue
+            previous = old_children[match]
+            if isinstance(child, HTMLobj):
+                if previous is not child:  # a subtree shared by both trees is unchanged
+                    stack.append((previous, child, (*path, i)))
+            elif str(previous) != str(child):
+                patches.append(Patch("set-text", (*path, i), None, str(child)))
+    return patches
+
+
+def apply_patches(tree: HTMLobj, patches: list[Patch]) -> HTMLobj:
+    """applies patches to a HTMLobj tree in place (returned, a replace of the root
+    gives a new tree), the html of inserted nodes is read back with web.parser. a
+    Markup text holding several elements comes back as these nodes, the paths of the
+    next patches are shifted past them"""
+    from web.parser import parse
+
+    # parent path -> {index: nodes added after it}, both as the patches count them
+    shifts: dict[tuple, dict[int, int]] = {}
+
+    def shifted(path: tuple) -> tuple:
+        if not shifts:
+            return path
+        moved = []
+        for depth, i in enumerate(path):
+            added = shifts.get(path[:depth])
+            moved.append(i + sum(n for j, n in added.items() if j < i) if added else i)
+        return tuple(moved)
+
+    def node_at(path: tuple) -> Any:
+        node = tree
+        for i in path:
+            node = _children(node)[i]
+        return node
+
+    for patch in patches:
+        op, path = patch.op, shifted(patch.path)
+        if op == "replace" and not path:
+            tree = parse(patch.value, keep_whitespace=True)
+            continue
+        if op in ("set-attribute", "set-style"):
+            node = node_at(path)
+            if op == "set-style":
+                if not isinstance(node.css, CSSobj):
+                    node.css = CSSobj()
+                if patch.value is None:
+                    styles = dict(node.css.styles)
+                    styles.pop(patch.name, None)
+                    node.css.styles = styles
+                    if not styles:  # an empty CSSobj would still render style=""
+                        node.css = None
+                    node.invalidate()
+                else:
+                    node.css[patch.name] = patch.value
+            elif patch.name == "class":
+                node.class_ = patch.value
+            elif patch.value is None:
+                attributes = dict(node.attributes)
+                attributes.pop(patch.name, None)
+                node.attributes = attributes
+            else:
+                node[patch.name] = patch.value
+            continue
+        parent = node_at(path[:-1])
+        children = _children(parent)
+        if op in ("insert", "replace"):
+            items = _parsed_items(parse(patch.value, keep_whitespace=True))
+            children[path[-1] : path[-1] + (op == "replace")] = items
+            if len(items) > 1:
+                shifts.setdefault(patch.path[:-1], {})[patch.path[-1]] = len(items) - 1
+        elif op == "remove":
+            children.pop(path[-1])
+        elif op == "move":
+            children.insert(patch.value, children.pop(path[-1]))
+        elif op == "set-text":
+            children[path[-1]] = patch.value
+        parent.contents = children
+    return tree
@@ -1,31 +1,32 @@
-from typing import Any, Iterator, Self, Union
-from functools import singledispatchmethod
-from uuid import uuid4
+from typing import Any, Callable, Iterable, Iterator, Self, Union
+from sys import intern
+from time import perf_counter
+from types import GeneratorType, MappingProxyType
+from weakref import WeakSet
 from web.css import CSSobj
-from webbrowser import open_new_tab as open_new_browser_tab
-from os.path import isfile, abspath
-from os import remove
+from web.markup import escape, escape_attribute
+from web.output import Compression, Sink, export_chunks, write_chunks
+from web.selector import TreeIndex
 
 # HTML engine v1.0
 
+# shared by the nodes compact() shrinks, it is read only so writers replace it first
+_NO_ATTRIBUTES = MappingProxyType({})
+# the indexes kept by roots, a node none of them holds has no index to keep up to date
+_live_indexes: "WeakSet[TreeIndex]" = WeakSet()
+
+
+# void elements never have contents nor an end tag
+_VOID_ELEMENTS = frozenset(
+    ("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param")
+    + ("source", "track", "wbr")
+)
+# the text inside these is not html, it is written as it is
+_RAW_TEXT_ELEMENTS = frozenset(("script", "style"))
+
 
 def is_self_closing_tag(tag: str) -> bool:
-    return tag in [
-        "area",
-        "base",
-        "br",
-        "col",
-        "embed",
-        "hr",
-        "img",
-        "input",
-        "link",
-        "meta",
-        "param",
-        "source",
-        "track",
-        "wbr",
-    ]
+    return tag in _VOID_ELEMENTS
 
 
 class HTMLobj:
@@ -36,7 +37,14 @@ class HTMLobj:
         "contents",
         "attributes",
         "self_closing",
-        "__indent",
+        "memoize",
+        "_parent",
+        "_clean",
+        "_index",
+        "_rendered",
+        "_hash",
+        "_start",
+        "__weakref__",
     )
 
     def __init__(
@@ -47,16 +55,181 @@ class HTMLobj:
         *contents: Union[str, "HTMLobj", Any],
         **attributes: str,
     ) -> None:
-        self.tag = tag
-        self.css = css
-        self.class_ = class_
-        self.contents = [*contents]
-        self.attributes = attributes
-        self.self_closing = is_self_closing_tag(self.tag)
+        # a new node has nothing to invalidate yet, skip the tracking of __setattr__
+        set_ = object.__setattr__
+        set_(self, "_parent", None)
+        set_(self, "_clean", False)
+        set_(self, "_index", None)
+        set_(self, "_rendered", None)
+        set_(self, "_hash", None)
+        set_(self, "_start", None)
+        set_(self, "memoize", False)
+        set_(self, "tag", intern(tag) if type(tag) is str else tag)
+        set_(self, "css", css)
+        set_(self, "class_", class_)
+        set_(self, "contents", [*contents])
+        set_(self, "attributes", attributes)
+        set_(self, "self_closing", is_self_closing_tag(tag))
         if self.self_closing and self.contents:
             raise ValueError("A self closing html object cant contain sub elements")
-        if not hasattr(self, "__indent"):
-            self.__indent = 0
+        lazy = False
+        for i in contents:
+            if isinstance(i, HTMLobj):
+                i._adopted_by(self)
+            elif type(i) is GeneratorType:
+                lazy = True
+        if lazy:  # a generator given as a content yields the children while rendering
+            set_(self, "contents", [Lazy(i) if type(i) is GeneratorType else i for i in contents])
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name not in _TRACKED_FIELDS:
+            object.__setattr__(self, name, value)
+            return
+        indexes = self._indexes() if name != "css" else ()
+        old = getattr(self, name, None)
+        if name == "contents":
+            children = [i for i in old or () if isinstance(i, HTMLobj)]
+            object.__setattr__(self, name, value)
+            current = [i for i in value or () if isinstance(i, HTMLobj)]
+            if len(children) != len(current) or any(i is not j for i, j in zip(children, current)):
+                kept = {id(i) for i in current}
+                for i in children:
+                    if id(i) not in kept:
+                        i._unlink(self)
+                for i in current:
+                    i._adopted_by(self)
+                for index in indexes:
+                    self._update(index, [(i, False) for i in children] + [(i, True) for i in current])
+        else:
+            for index in indexes:
+                index.discard(self)
+            object.__setattr__(self, name, value)
+            for index in indexes:
+                index.refresh(self, old if name == "tag" else None)
+        self._touch()
+
+    def _adopted_by(self, parent: "HTMLobj") -> None:
+        """links the node to one more parent, a node reused in several trees (a nav bar
+        in every page) has them all so its changes reach each of them"""
+        current = self._parent
+        if current is None or current is parent:
+            object.__setattr__(self, "_parent", parent)
+        elif type(current) is list:
+            if not any(i is parent for i in current):
+                current.append(parent)
+        else:
+            object.__setattr__(self, "_parent", [current, parent])
+        if self._index is not None:
+            self._index = None  # only the root of a tree keeps an index
+
+    def _unlink(self, parent: "HTMLobj") -> None:
+        "forgets a parent whose contents don't hold the node anymore"
+        current = self._parent
+        if current is parent:
+            object.__setattr__(self, "_parent", None)
+        elif type(current) is list:
+            rest = [i for i in current if i is not parent]
+            object.__setattr__(self, "_parent", rest if len(rest) > 1 else rest[0])
+
+    def _touch(self) -> None:
+        """marks the node and its ancestors (through every parent) as modified, dropping
+        the rendered output and the hash cached for them. a node that isn't clean has no
+        memoized or hashed ancestor so the walk stops there"""
+        object.__setattr__(self, "_start", None)  # its attributes may have changed
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if not node._clean:
+                continue
+            object.__setattr__(node, "_clean", False)
+            object.__setattr__(node, "_rendered", None)
+            object.__setattr__(node, "_hash", None)
+            parent = node._parent
+            if type(parent) is list:
+                stack.extend(parent)
+            elif parent is not None:
+                stack.append(parent)
+
+    def _indexes(self) -> list[TreeIndex]:
+        "the indexes built for the trees holding this node, usually none"
+        if not any(self in i for i in _live_indexes):
+            return []  # no walk to the root, building a deep tree stays linear
+        found: list[TreeIndex] = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            parent = node._parent
+            if type(parent) is list:
+                stack.extend(parent)
+            elif parent is not None:
+                stack.append(parent)
+            elif node._index is not None and self in node._index:
+                if not any(i is node._index for i in found):
+                    found.append(node._index)
+        return found
+
+    def _update(self, index: TreeIndex, changes: list[tuple["HTMLobj", bool]]) -> None:
+        "removes (False) or inserts (True) child subtrees in the index of a tree"
+        try:
+            for child, inserted in changes:
+                if inserted:
+                    index.insert(self, child, HTMLobj)
+                else:
+                    index.remove(self, child)
+        except ValueError:
+            # a node now at two places of the tree, select() raises it on a fresh index
+            root = self._root()
+            if root._index is index:
+                object.__setattr__(root, "_index", None)
+
+    def invalidate(self) -> None:
+        """call it after mutating contents or attributes in place instead of through the
+        methods, the indexes of the trees holding the node are built again when needed"""
+        for i in self.contents or ():
+            if isinstance(i, HTMLobj):
+                i._adopted_by(self)
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            parent = node._parent
+            if type(parent) is list:
+                stack.extend(parent)
+            elif parent is not None:
+                stack.append(parent)
+            else:
+                object.__setattr__(node, "_index", None)
+        self._clean = True
+        self._touch()
+
+    def __getstate__(self) -> dict:
+        """the parents, the index and the caches are left out of pickles and copies, a
+        copied subtree doesn't drag its ancestors along. shared read only containers
+        come back as regular ones"""
+        contents, attributes = self.contents, self.attributes
+        return {
+            "tag": self.tag,
+            "css": self.css,
+            "class_": self.class_,
+            "contents": list(contents) if type(contents) is tuple else contents,
+            "attributes": dict(attributes) if type(attributes) is MappingProxyType else attributes,
+            "self_closing": self.self_closing,
+            "memoize": self.memoize,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        set_ = object.__setattr__
+        set_(self, "_clean", False)
+        set_(self, "_index", None)
+        set_(self, "_rendered", None)
+        set_(self, "_hash", None)
+        set_(self, "_start", None)
+        if not hasattr(self, "_parent"):  # restored after its parent, which linked it
+            set_(self, "_parent", None)
+        for name, value in state.items():
+            set_(self, name, value)
+        for i in self.contents or ():
+            if isinstance(i, HTMLobj):
+                i._adopted_by(self)
 
     def __iter__(self) -> Iterator:
         return iter(self.contents)
@@ -71,23 +244,99 @@ class HTMLobj:
         }
 
     def __tag__(self) -> tuple[str, str]:
-        attributes = []
-        if isinstance(self.css, CSSobj):
-            attributes.append(f'styles="{self.css.inline_css()}"')
-        if self.class_:
-            attributes.append(f"class={self.class_}")
-        for i in self.attributes or {}:
-            attributes.append(f'{i}="{self.attributes[i]}"')
-        attributes = f" {' '.join(attributes)}" if attributes else ""
+        """the start and end tag, the attribute values (inline css and class included) escaped.
+        the written class and attributes are kept until the node changes, and the inline
+        css by its CSSobj, so a page rendered again doesn't build nor scan them twice"""
+        tags = _tag_table.get(self.tag) or _tag_strings(self.tag)
+        written = self._start
+        if written is None:
+            class_, attributes = self.class_, self.attributes
+            if class_ or attributes:
+                parts = [f' class="{class_}"'] if class_ else []
+                if attributes:
+                    for key, value in attributes.items():
+                        parts.append(f' {key}="{value}"')
+                # the values are checked at once, they rarely need escaping
+                written = "".join(parts)
+                if "&" in written or "<" in written or ">" in written or written.count('"') != 2 * len(parts):
+                    written = self._escaped_attributes()
+                object.__setattr__(self, "_start", written)
+            else:
+                written = ""
+        css = self.css
+        if css is not None and isinstance(css, CSSobj):
+            written = f"{css._attribute or css._style_attribute()}{written}"
+        if not written:
+            return (tags[0], "/>") if self.self_closing else (tags[1], tags[2])
         if self.self_closing:
-            return f"<{self.tag}{attributes}", "/>"
-        return f"<{self.tag}{attributes}>", f"</{self.tag}>"
+            return f"{tags[0]}{written}", "/>"
+        return f"{tags[0]}{written}>", tags[2]
+
+    def _escaped_attributes(self) -> str:
+        "the class and attributes, the inline css is escaped by CSSobj._style_attribute"
+        parts = [f' class="{escape_attribute(self.class_)}"'] if self.class_ else []
+        for key, value in (self.attributes or {}).items():
+            parts.append(f' {key}="{escape_attribute(value)}"')
+        return "".join(parts)
+
+    def content_hash(self) -> str:
+        """a hash of the subtree (tags, class, styles, attributes and contents), equal for
+        the subtrees rendering the same html. cached until a node of the subtree changes,
+        comparing it is far cheaper than comparing the rendered strings"""
+        if self._hash is not None:
+            return self._hash
+        from hashlib import blake2b  # hashlib is slow to import, most pages never hash
+
+        # children are hashed before their parent, a (node,) tuple waits for them
+        stack: list[Any] = [self]
+        pop, push = stack.pop, stack.append
+        set_ = object.__setattr__
+        while stack:
+            node = pop()
+            if type(node) is tuple:
+                node = node[0]
+            elif node.contents:
+                pending = [
+                    i for i in node.contents if isinstance(i, HTMLobj) and i._hash is None
+                ]
+                if pending:
+                    push((node,))
+                    stack += pending
+                    continue
+            css, attributes, class_ = node.css, node.attributes, node.class_
+            if isinstance(css, CSSobj):
+                css._watch(node)
+            if class_ or attributes or isinstance(css, CSSobj):
+                # the repr keeps the fields apart whatever characters they hold
+                parts = [
+                    repr(
+                        (
+                            node.tag,
+                            str(class_) if class_ else None,
+                            css.inline_css() if isinstance(css, CSSobj) else None,
+                            [(key, str(value)) for key, value in attributes.items()]
+                            if attributes
+                            else None,
+                        )
+                    )
+                ]
+            else:
+                parts = [f"<{node.tag}"]
+            raw = node.tag in _RAW_TEXT_ELEMENTS
+            for i in node.contents or ():
+                if isinstance(i, HTMLobj):
+                    parts.append(i._hash)
+                elif i is not None:
+                    text = str(i) if raw else escape(i)
+                    parts.append(f"{len(text)}:{text}")
+            # a hashed node is clean so that its changes reach the hashes above
+            set_(node, "_clean", True)
+            digest = blake2b("\x00".join(parts).encode("utf-8", "surrogatepass"), digest_size=16)
+            set_(node, "_hash", digest.hexdigest())
+        return self._hash
 
     def __str__(self) -> str:
-        contents = [str(i) for i in self.contents if i is not None]
-        contents = "".join(contents)
-        startTAG, endTAG = self.__tag__()
-        return f"{startTAG}{contents if contents else ''}{endTAG}"
+        return "".join(self.iter_render())
 
     def __enter__(self) -> Self:
         return self
@@ -102,67 +351,248 @@ class HTMLobj:
         )  # wiping the class to save up memory
         return not type or not issubclass(type, Exception)
 
-    @singledispatchmethod
-    def __getitem__(self, _key: Any):
-        return NotImplemented
-
-    @__getitem__.register
-    def _(self, key: str):
-        return self.attributes[key]
-
-    @__getitem__.register
-    def _(self, index: int):
-        return self.contents[index]
-
-    @singledispatchmethod
-    def __setitem__(self, _key: Any, _value: Any) -> None:
+    def __getitem__(self, key: str | int) -> Any:
+        "a str key gives an attribute, an int index a content"
+        if isinstance(key, str):
+            return self.attributes[key]
+        if isinstance(key, int):
+            return self.contents[key]
         return NotImplemented
 
-    @__setitem__.register
-    def _(self, key: str, value: Any):
-        self.attributes[key] = value
-
-    @__setitem__.register
-    def _(self, index: int, value: Any):
-        self.contents[index] = value
+    def __setitem__(self, key: str | int, value: Any) -> None:
+        if isinstance(key, str):
+            if type(self.attributes) is MappingProxyType or self.attributes is None:
+                self.attributes = dict(self.attributes or ())  # a shared read only map
+            indexes = self._indexes()
+            for index in indexes:
+                index.discard(self)
+            self.attributes[key] = value
+            for index in indexes:
+                index.refresh(self)
+            self._touch()
+        elif isinstance(key, int):
+            old = self.contents[key]
+            indexes = self._indexes() if isinstance(old, HTMLobj) or isinstance(value, HTMLobj) else ()
+            self.contents[key] = value
+            changes = []
+            if isinstance(old, HTMLobj):
+                if not any(i is old for i in self.contents):
+                    old._unlink(self)
+                changes.append((old, False))
+            if isinstance(value, HTMLobj):
+                value._adopted_by(self)
+                changes.append((value, True))
+            for index in indexes:
+                self._update(index, changes)
+            self._touch()
+        else:
+            return NotImplemented
 
     def __contains__(self, content) -> bool:
         return content in self.contents
 
     def __getattr__(self, tag: str) -> Any:
-        for i in self.contents:
-            if isinstance(i, HTMLobj):
-                if i.tag == tag:
-                    return i
+        if tag.startswith("_"):
+            # never a tag, also keeps half initialized objects from recursing in here
+            raise AttributeError(tag)
+        index = self._built_index()
+        if index is not None:
+            child = index.first_child(self, tag)
+            if child is not None:
+                return child
+        else:
+            for i in _no_lazy(self.contents):
+                if isinstance(i, HTMLobj):
+                    if i.tag == tag:
+                        return i
         raise AttributeError(f"The HTMLobj doesn't have {tag} as an attribute")
 
-    def prettify(self, space: str = "  ") -> str:
-        contents = []
-        for i in self.contents or []:
-            if i is None:
+    def _root(self) -> "HTMLobj":
+        "the root of the tree, following the first parent of a node in several trees"
+        node = self
+        while node._parent is not None:
+            node = node._parent
+            if type(node) is list:
+                node = node[0]
+        return node
+
+    def _built_index(self) -> TreeIndex | None:
+        "the index of the tree this node belongs to if it is still up to date"
+        index = self._root()._index
+        return index if index is not None and self in index else None
+
+    def _tree_index(self) -> TreeIndex:
+        "returns the index of the tree this node belongs to, building it if needed"
+        root = self._root()
+        if root._index is None:
+            index = TreeIndex(root, HTMLobj)
+            for node in index.nodes:
+                _no_lazy(node.contents)
+            root._index = index
+            _live_indexes.add(index)
+        if self not in root._index:
+            # a stale parent link, the node was taken out of contents by hand
+            return TreeIndex(self, HTMLobj)
+        return root._index
+
+    def select(self, selector: str) -> list["HTMLobj"]:
+        "returns the descendants matching a css selector in document order"
+        return self._tree_index().select(self, selector)
+
+    def select_one(self, selector: str) -> Union["HTMLobj", None]:
+        return self._tree_index().select_one(self, selector)
+
+    def iter_render(self, pretty: bool = False, indent: str = "  ") -> Iterator[str]:
+        """yields the html code in chunks, walking the tree with an explicit
+        stack so deeply nested documents don't hit the recursion limit.
+        nodes with memoize set reuse their output until they or a descendant change"""
+        # the stack holds ready to emit strings, nodes (paired with their level when
+        # pretty, as the texts), the _CaptureEnd of a memoized node whose output is
+        # being recorded or the end of a profiled node
+        stack: list[Any] = [(self, 0)]
+        pop, push = stack.pop, stack.append
+        captures: list[list[str]] = []
+        profile = _render_profile
+        # pieces are yielded joined by batches, resuming the generator for each of them
+        # costs more than the rest of the walk
+        batch: list[str] = []
+        while stack:
+            item = pop()
+            # end tags and texts are most of the stack, checked first
+            if type(item) is str:
+                chunk = item
+            elif type(item) is _ProfileEnd:
+                profile._end(item.tag)
                 continue
-            if isinstance(i, HTMLobj):
-                i.__indent = self.__indent + 1
-                contents.append(i.prettify())
+            elif type(item) is _CaptureEnd:
+                chunk = "".join(captures.pop())
+                node = item.node
+                if node._rendered is None:
+                    object.__setattr__(node, "_rendered", {})
+                node._rendered[item.key] = chunk
+            elif type(item) is _LazyItems:
+                # one child taken from the source per turn, put back behind it
+                for child in item.items:
+                    if child is not None:
+                        break
+                else:
+                    continue
+                push(item)
+                if item.end is not None:
+                    item.end.produced = True
+                if not isinstance(child, HTMLobj):
+                    child = str(child) if item.raw else escape(child)
+                push((child, item.level) if pretty else child)
+                if pretty:
+                    push("\n")
+                continue
+            elif type(item) is _LazyEnd:
+                chunk = f"\n{item.spaces}{item.tag}" if item.produced else item.tag
             else:
-                contents.append(f"{space * (self.__indent + 1)}{i}")
-        contents = "\n".join(contents)
-        contents = f"\n{contents}\n" if contents else ""
-        startTAG, endTAG = self.__tag__()
-        local_spaces = space * self.__indent
-        contents_relative_spaces = local_spaces if contents else ""
-        return f"{local_spaces}{startTAG}{contents}{contents_relative_spaces}{endTAG}"
-
-    def export(self, html_filepath: str, append: bool = False) -> None:
-        "export the css data to a .css file, via appending or rewriting a file completly"
-        mode = "w" if not append else "a"
-        try:
-            with open(html_filepath, mode, encoding="utf-8") as f:
-                f.write(self.prettify("\t"))
-        except PermissionError:
-            print("couldn't continue the process due to lack of permission")
-        except IOError as e:
-            print("couldn't continue the process due to %s", e)
+                # a node, paired with its level when pretty, or Markup
+                content, level = item if type(item) is tuple else (item, 0)
+                if not isinstance(content, HTMLobj):
+                    chunk = f"{indent * level}{content}"  # a text, escaped when pushed
+                else:
+                    if profile is not None:
+                        profile._start(content.tag)
+                        push(_ProfileEnd(content.tag))
+                    if content.memoize:
+                        key = (indent, level) if pretty else None
+                        cached = content._rendered and content._rendered.get(key)
+                        if cached is not None:
+                            _cache_stats["hits"] += 1
+                            (captures[-1] if captures else batch).append(cached)
+                            continue
+                        _cache_stats["misses"] += 1
+                        push(_CaptureEnd(content, key))
+                        captures.append([])
+                    if captures:
+                        # the output now depends on this node, changes must reach the cache
+                        object.__setattr__(content, "_clean", True)
+                        if isinstance(content.css, CSSobj):
+                            content.css._watch(content)
+                    startTAG, endTAG = content.__tag__()
+                    raw = content.tag in _RAW_TEXT_ELEMENTS
+                    contents = content.contents
+                    if not pretty:
+                        if not contents:
+                            chunk = f"{startTAG}{endTAG}"
+                        elif len(contents) == 1 and isinstance(contents[0], str):
+                            # a leaf holding a text, the most common node, done in one piece
+                            text = contents[0]
+                            chunk = f"{startTAG}{text if raw else escape(text)}{endTAG}"
+                        else:
+                            chunk = startTAG
+                            push(endTAG)
+                            for child in reversed(contents):
+                                if isinstance(child, HTMLobj):
+                                    push(child)
+                                elif type(child) is Lazy:
+                                    push(_LazyItems(child, 0, raw))
+                                elif type(child) is str and not raw:
+                                    # escape inlined, most texts have nothing to escape
+                                    if "&" in child or "<" in child or ">" in child:
+                                        child = escape(child)
+                                    push(child)
+                                elif child is not None:
+                                    push(str(child) if raw else escape(child))
+                    else:
+                        children = [
+                            i if isinstance(i, (HTMLobj, Lazy)) else str(i) if raw else escape(i)
+                            for i in contents or ()
+                            if i is not None
+                        ]
+                        if not children:
+                            chunk = f"{indent * level}{startTAG}{endTAG}"
+                        else:
+                            local_spaces = indent * level
+                            chunk = f"{local_spaces}{startTAG}"
+                            end = None
+                            if all(type(i) is Lazy for i in children):
+                                # lazy contents may give nothing, rendered as empty ones
+                                end = _LazyEnd(endTAG, local_spaces)
+                                push(end)
+                            else:
+                                push(f"\n{local_spaces}{endTAG}")
+                            for child in reversed(children):
+                                if type(child) is Lazy:
+                                    push(_LazyItems(child, level + 1, raw, end))  # puts the "\n"s
+                                else:
+                                    push((child, level + 1))
+                                    push("\n")
+            if captures:
+                captures[-1].append(chunk)
+            else:
+                batch.append(chunk)
+                if len(batch) >= _BATCH_SIZE:
+                    yield "".join(batch)
+                    batch = []
+        if batch:
+            yield "".join(batch)
+
+    def prettify(self, space: str = "  ") -> str:
+        return "".join(self.iter_render(True, space))
+
+    def render_into(
+        self,
+        sink: Sink,
+        pretty: bool = False,
+        indent: str = "  ",
+        compress: Compression = None,
+        fill: bool = False,
+    ) -> int:
+        """renders straight into a bytearray, a memoryview or anything with write(bytes),
+        as utf-8 (gzip, zlib or deflate compressed if asked), returns the bytes written.
+        fill writes a pre-sized bytearray from its start instead of extending it"""
+        return write_chunks(self.iter_render(pretty, indent), sink, compress, fill=fill)
+
+    def export(
+        self, html_filepath: str, append: bool = False, compress: Compression = None
+    ) -> int:
+        """export the html data to a .html file, via appending or rewriting a file completly,
+        returns the bytes written. OSError (permission, disk full...) is raised"""
+        return export_chunks(self.iter_render(True, "\t"), html_filepath, append, compress)
 
     def txt(self) -> Iterator:
         return filter(lambda x: isinstance(x, str), self.contents)
@@ -174,27 +604,52 @@ class HTMLobj:
         self,
         tag: str,
         class_: str = None,
+        recursive: bool = False,
         **attributes: str,
     ) -> Union["HTMLobj", None]:
-        for i in filter(lambda x: isinstance(x, HTMLobj), self.contents):
-            if i.tag == tag and i.class_ == class_ and i.attributes == attributes:
-                return i
+        return next(self.find_all(tag, class_, recursive, **attributes), None)
 
     def find_all(
         self,
         tag: str,
         class_: str = None,
+        recursive: bool = False,
         **attributes: str,
     ) -> Iterator:
+        "recursive searches every descendant through the tree index instead of the contents"
+        if recursive:
+            candidates = self._tree_index().in_scope(self, tag)
+        else:
+            candidates = (i for i in _no_lazy(self.contents) if isinstance(i, HTMLobj))
         return filter(
             lambda x: (
                 x.tag == tag and x.class_ == class_ and x.attributes == attributes
             ),
-            (i for i in self.contents if isinstance(i, HTMLobj)),
+            candidates,
         )
 
+    def materialize(self) -> Self:
+        """replaces the lazy contents of the subtree by the children they give, so they can
+        be searched, hashed or diffed. a one shot source is consumed by it"""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            contents = node.contents
+            if contents and any(type(i) is Lazy for i in contents):
+                node.contents = [
+                    j for i in contents for j in (i if type(i) is Lazy else (i,)) if j is not None
+                ]
+            stack.extend(i for i in node.contents or () if isinstance(i, HTMLobj))
+        return self
+
     def preview(self) -> None:
         "Opens a temp file that contains the html code to open it in the browser"
+        # only needed here, webbrowser and uuid are slow to import
+        from os import remove
+        from os.path import abspath, isfile
+        from uuid import uuid4
+        from webbrowser import open_new_tab as open_new_browser_tab
+
         try:
             with open(abspath(f"${uuid4()}.html"), "w", encoding="utf-8") as f:
                 f.write(self.prettify("\t"))
@@ -209,12 +664,189 @@ class HTMLobj:
         if self.self_closing:
             raise ValueError("Cannot add elements to a self closing html object")
         if not isinstance(self.contents, list):
-            self.contents = []
+            self.contents = [*(self.contents or ())]
         self.contents.append(value)
+        if isinstance(value, HTMLobj):
+            value._adopted_by(self)
+            for index in self._indexes():
+                self._update(index, [(value, True)])
+        self._touch()
 
     def append(self, value: Any) -> None:
         return self.add(value)
 
 
+def parse(source, keep_whitespace: bool = False) -> Union[HTMLobj, list]:
+    "parses markup (a string, bytes or a file) into HTMLobj trees, see web.parser"
+    from web.parser import parse as parse_markup  # web.parser imports this module
+
+    return parse_markup(source, keep_whitespace)
+
+
+class LazyContentsError(TypeError):
+    "lazy contents were searched, hashed or stored before HTMLobj.materialize()"
+
+
+class Lazy:
+    """contents produced while rendering : an iterable (a generator, rows mapped from a
+    database cursor...) read once, or a callable returning a new iterable at every
+    render. each item is rendered like a content and dropped, so a huge table streams
+    in constant memory. searches, hashes, diffs and ArenaDocument need the children at
+    hand and raise LazyContentsError until HTMLobj.materialize() is called"""
+
+    __slots__ = ("source", "_used")
+
+    def __init__(self, source: Union[Iterable, Callable[[], Iterable]]) -> None:
+        self.source = source
+        self._used = False
+
+    def __iter__(self) -> Iterator:
+        source = self.source
+        if callable(source):
+            return iter(source())
+        items = iter(source)
+        if items is source:
+            if self._used:
+                raise RuntimeError(
+                    "these lazy contents were already read, give a callable to render them again"
+                )
+            self._used = True
+        return items
+
+    def __str__(self) -> str:
+        raise LazyContentsError(
+            "lazy contents can't be hashed, stored or written as text before HTMLobj.materialize()"
+        )
+
+    def __repr__(self) -> str:
+        return f"Lazy({self.source!r})"
+
+
+def _no_lazy(contents: Any) -> Any:
+    if contents and any(type(i) is Lazy for i in contents):
+        raise LazyContentsError("the contents are lazy, call HTMLobj.materialize() to search them")
+    return contents or ()
+
+
+class _LazyItems:
+    "the items of a Lazy being rendered, at the level of the node holding them"
+
+    __slots__ = ("items", "level", "raw", "end")
+
+    def __init__(self, lazy: Lazy, level: int, raw: bool, end: "_LazyEnd" = None) -> None:
+        self.items = iter(lazy)
+        self.level = level
+        self.raw = raw
+        self.end = end
+
+
+class _LazyEnd:
+    """the pretty end tag of a node holding only Lazy contents, on a line of its own once
+    one of them gave an item, right after the start tag when they were all empty"""
+
+    __slots__ = ("tag", "spaces", "produced")
+
+    def __init__(self, tag: str, spaces: str) -> None:
+        self.tag = tag
+        self.spaces = spaces
+        self.produced = False
+
+
+class _CaptureEnd:
+    __slots__ = ("node", "key")
+
+    def __init__(self, node: HTMLobj, key: tuple[str, int] | None) -> None:
+        self.node = node
+        self.key = key
+
+
+class _ProfileEnd:
+    __slots__ = ("tag",)
+
+    def __init__(self, tag: str) -> None:
+        self.tag = tag
+
+
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def render_cache_stats() -> dict[str, int]:
+    "hits and misses of the memoized HTMLobj outputs since the last reset"
+    return dict(_cache_stats)
+
+
+def reset_render_cache_stats() -> None:
+    _cache_stats["hits"] = _cache_stats["misses"] = 0
+
+
+class RenderProfile:
+    """opt-in instrumentation of the renders done inside a with block : per tag, the
+    number of rendered elements, the time spent in their whole subtrees and in the
+    elements themselves (children excluded). a streamed render also counts the time
+    the consumer of iter_render holds the generator"""
+
+    __slots__ = ("calls", "total", "own", "_open", "_previous")
+
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = {}
+        self.total: dict[str, float] = {}
+        self.own: dict[str, float] = {}
+        self._open: list[list[float]] = []  # [start time, time spent in the children]
+        self._previous = None
+
+    def __enter__(self) -> Self:
+        global _render_profile
+        self._previous, _render_profile = _render_profile, self
+        return self
+
+    def __exit__(self, type, value, traceback):
+        global _render_profile
+        _render_profile, self._previous = self._previous, None
+        return not type or not issubclass(type, Exception)
+
+    def _start(self, tag: str) -> None:
+        self.calls[tag] = self.calls.get(tag, 0) + 1
+        self._open.append([perf_counter(), 0.0])
+
+    def _end(self, tag: str) -> None:
+        start, children = self._open.pop()
+        elapsed = perf_counter() - start
+        self.total[tag] = self.total.get(tag, 0.0) + elapsed
+        self.own[tag] = self.own.get(tag, 0.0) + elapsed - children
+        if self._open:
+            self._open[-1][1] += elapsed
+
+    def report(self) -> list[tuple[str, int, float, float]]:
+        "(tag, calls, total seconds, own seconds) rows, the most expensive tags first"
+        rows = [(tag, calls, self.total[tag], self.own[tag]) for tag, calls in self.calls.items()]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def __str__(self) -> str:
+        lines = [f"{'tag':<12} {'calls':>9} {'total ms':>10} {'own ms':>10}"]
+        for tag, calls, total, own in self.report():
+            lines.append(f"{tag:<12} {calls:>9} {total * 1e3:>10.2f} {own * 1e3:>10.2f}")
+        return "\n".join(lines)
+
+
+_render_profile: RenderProfile | None = None
+
+# pieces joined in each chunk yielded by iter_render
+_BATCH_SIZE = 256
+
+# tag -> ("<tag", "<tag>", "</tag>"), built once per tag name
+_tag_table: dict[str, tuple[str, str, str]] = {}
+
+
+def _tag_strings(tag: str) -> tuple[str, str, str]:
+    strings = (f"<{tag}", f"<{tag}>", f"</{tag}>")
+    if len(_tag_table) < 4096:  # tag names are few, this only bounds odd generated ones
+        _tag_table[tag] = strings
+    return strings
+
+
+# assigning any of these marks the node as modified
+_TRACKED_FIELDS = frozenset(("tag", "css", "class_", "contents", "attributes"))
+
+
 def Basic_HTMLobj(tag: str, *contents) -> "HTMLobj":
     return HTMLobj(tag, None, None, *contents)
@@ -1,5 +1,4 @@
-from functools import singledispatchmethod
-from typing import Any, Literal, Self
+from typing import Literal, Self
 
 
 class Function:
@@ -50,24 +49,21 @@ class Function:
             f"Function has give {len(args)} but it require only {len(self.args_demanded)}"
         )
 
-    def as_script(self) -> str:
-        p_contents = []
-        for i in self.contents:
-            if i is None:
-                continue
-            elif isinstance(i, Function):
-                i.indent_lev = self.indent_lev + 1
-                p_contents.append(i.as_script())
-            else:
-                p_contents.append(str(i))
-        p_contents = f"\n{'\n'.join(p_contents)}\n" if p_contents else ""
-        return f"{'async ' if self.async_ else ''}function {self.name}({', '.join(self.args_demanded)}) {'{'}{p_contents}\n{'}'}"
+    def as_script(self, minify: bool = False) -> str:
+        "see web.script.Script, which renders nested functions without recursion"
+        from web.script import Script
+
+        return Script(self).render(minify)
 
 
 def call_function(name: str, text: str) -> str:
     return f"{name}({text})"
 
 
+# the attributes of a Var itself, any other attribute is one of the javascript value
+_VAR_FIELDS = frozenset(("var_name", "declaration", "value", "type", "items"))
+
+
 class Var:
     def __init__(
         self,
@@ -98,36 +94,31 @@ class Var:
             return f"global.{self.var_name} = {value};"
         return f"{self.value} = {value};"
 
-    @singledispatchmethod
-    def __setitem__(self, _key: Any, _value: Any) -> None:
+    def __setitem__(self, key: str | int, value: str) -> None:
+        "str keys set the items of a hash or an instance, int ones those of an array"
+        if isinstance(key, str):
+            if self.type in ["hash", "instance"]:
+                self.items[key] = value
+        elif isinstance(key, int):
+            if self.type == "array":
+                self.items[key] = value
         return NotImplemented
 
-    @__setitem__.register
-    def _(self, key: str, value: str):
-        if self.type in ["hash", "instance"]:
-            self.items[key] = value
+    def __getitem__(self, key: str) -> str:
+        if isinstance(key, str):
+            return self.items[key]
         return NotImplemented
 
-    @__setitem__.register
-    def _(self, key: int, value: str):
-        if self.type == "array":
-            self.items[key] = value
-        return NotImplemented
-
-    @singledispatchmethod
-    def __getitem__(self, _key: Any) -> None:
-        return NotImplemented
-
-    @__getitem__.register
-    def _(self, key: str) -> str:
-        return self.items[key]
-
     def __getattr__(self, attribute: str) -> str:
+        if attribute in _VAR_FIELDS or attribute.startswith("_"):
+            raise AttributeError(attribute)
         if self.type in ["hash", "instance"]:
             return self[attribute]
         return NotImplemented
 
     def __setattr__(self, attribute: str, value: str) -> str:
+        if attribute in _VAR_FIELDS:
+            return object.__setattr__(self, attribute, value)
         if self.declaration == "global":
             return f"global.{self.var_name}.{attribute} = {value};"
         return f"{self.value}.{attribute} = {value}"
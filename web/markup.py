@@ -0,0 +1,61 @@
+from typing import Any
+
+# Escaping : text and attribute values are escaped when rendered, Markup marks a
+# string as html already so it is written as it is (and never escaped twice)
+
+
+class Markup(str):
+    """a string of html that the renderer writes without escaping it, also follows
+    the __html__ protocol of other template libraries. + escapes the plain strings
+    joined to it"""
+
+    __slots__ = ()
+
+    def __html__(self) -> "Markup":
+        return self
+
+    def __add__(self, other: Any) -> "Markup":
+        return Markup(str.__add__(self, escape(other)))
+
+    def __radd__(self, other: Any) -> "Markup":
+        return Markup(str.__add__(escape(other), self))
+
+    def __repr__(self) -> str:
+        return f"Markup({str.__repr__(self)})"
+
+    @classmethod
+    def escape(cls, value: Any) -> "Markup":
+        return cls(escape(value))
+
+
+def escape(value: Any) -> str:
+    """escapes text for the contents of an element : & < and >. objects with a __html__
+    method (Markup) give their html as it is"""
+    if type(value) is not str:
+        html = getattr(value, "__html__", None)
+        if html is not None:
+            return html()
+        value = str(value)
+    # most texts have nothing to escape, the membership tests are far cheaper than a pass
+    # rewriting the string. chained replace beats str.translate, whose table lookups are
+    # slow as soon as a character maps to several
+    if "&" in value or "<" in value or ">" in value:
+        return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return value
+
+
+def escape_attribute(value: Any) -> str:
+    "escapes an attribute value written between double quotes : & < > and \""
+    if type(value) is not str:
+        html = getattr(value, "__html__", None)
+        if html is not None:
+            return html()
+        value = str(value)
+    if "&" in value or "<" in value or ">" in value or '"' in value:
+        return (
+            value.replace("&", "&amp;")
+            .replace("<", "&lt;")
+            .replace(">", "&gt;")
+            .replace('"', "&quot;")
+        )
+    return value
@@ -0,0 +1,128 @@
+import zlib
+from typing import IO, Iterable, Literal, Union
+
+# Byte output : rendered text goes to a bytes sink as utf-8, batched into large
+# writes and optionally compressed on the fly, without building the whole page first
+
+Compression = Union[Literal["gzip", "zlib", "deflate"], None]
+Sink = Union[bytearray, memoryview, IO[bytes]]
+# zlib window bits giving each container around the deflate stream
+_WBITS = {"gzip": 16 + zlib.MAX_WBITS, "zlib": zlib.MAX_WBITS, "deflate": -zlib.MAX_WBITS}
+
+
+class ByteWriter:
+    """writes text chunks into a sink : a bytearray (extended, or filled from its start
+    like a memoryview when fill is set), a memoryview over a pre-sized buffer (filled
+    from its start, BufferError when it's full) or any object with write(bytes) like
+    files, sockets made into files, gzip streams or mmaps.
+    chunks are joined and encoded once per buffer_size characters. compress gives the
+    output as a gzip, zlib or raw deflate stream (the one browsers accept as
+    Content-Encoding). written is the count of bytes given to the sink"""
+
+    __slots__ = ("sink", "buffer_size", "written", "_pending", "_size", "_compressor", "_view")
+
+    def __init__(
+        self,
+        sink: Sink,
+        compress: Compression = None,
+        level: int = 6,
+        buffer_size: int = 1 << 16,
+        fill: bool = False,
+    ) -> None:
+        if compress is not None and compress not in _WBITS:
+            raise ValueError(f"unknown compression {compress!r}, use gzip, zlib or deflate")
+        # the view is released by close(), the bytearray can't be resized until then
+        self._view = memoryview(sink) if fill and isinstance(sink, bytearray) else None
+        self.sink = sink if self._view is None else self._view
+        self.buffer_size = buffer_size
+        self.written = 0
+        self._pending: list[str] = []
+        self._size = 0
+        self._compressor = (
+            zlib.compressobj(level, zlib.DEFLATED, _WBITS[compress]) if compress else None
+        )
+
+    def __enter__(self) -> "ByteWriter":
+        return self
+
+    def __exit__(self, type, value, traceback) -> None:
+        if type is None:
+            self.close()
+
+    def write(self, text: str) -> None:
+        self._pending.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def writelines(self, chunks: Iterable[str]) -> None:
+        pending, size, limit = self._pending, self._size, self.buffer_size
+        for chunk in chunks:
+            pending.append(chunk)
+            size += len(chunk)
+            if size >= limit:
+                self._size = size
+                self.flush()
+                pending, size = self._pending, 0
+        self._size = size
+
+    def flush(self) -> None:
+        "encodes the pending chunks and hands them to the sink"
+        if self._pending:
+            data = "".join(self._pending).encode("utf-8")
+            self._pending, self._size = [], 0
+            if self._compressor is not None:
+                data = self._compressor.compress(data)
+            self._put(data)
+
+    def close(self) -> int:
+        "flushes everything, ends the compressed stream and returns the bytes written"
+        self.flush()
+        if self._compressor is not None:
+            self._put(self._compressor.flush())
+            self._compressor = None
+        if self._view is not None:
+            self._view.release()
+        return self.written
+
+    def _put(self, data: bytes) -> None:
+        if not data:
+            return
+        sink = self.sink
+        if isinstance(sink, bytearray):
+            sink += data
+        elif isinstance(sink, memoryview):
+            end = self.written + len(data)
+            if end > len(sink):
+                raise BufferError(f"the output doesn't fit in the {len(sink)} bytes buffer")
+            sink[self.written : end] = data
+        else:
+            sink.write(data)
+        self.written += len(data)
+
+
+def write_chunks(
+    chunks: Iterable[str],
+    sink: Sink,
+    compress: Compression = None,
+    level: int = 6,
+    buffer_size: int = 1 << 16,
+    fill: bool = False,
+) -> int:
+    "writes text chunks (an iter_render for instance) into sink and returns the bytes written"
+    writer = ByteWriter(sink, compress, level, buffer_size, fill)
+    writer.writelines(chunks)
+    return writer.close()
+
+
+def export_chunks(
+    chunks: Iterable[str],
+    filepath: str,
+    append: bool = False,
+    compress: Compression = None,
+    level: int = 6,
+) -> int:
+    """writes text chunks into a file and returns the bytes written, I/O errors are
+    raised to the caller"""
+    with open(filepath, "ab" if append else "wb") as f:
+        return write_chunks(chunks, f, compress, level)
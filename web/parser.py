@@ -0,0 +1,270 @@
+from codecs import getincrementaldecoder
+from html import unescape
+from re import DOTALL, IGNORECASE, VERBOSE, compile as re_compile
+from typing import IO, Any, Iterator, Union
+from web.css import CSSobj
+from web.html_ import HTMLobj, _RAW_TEXT_ELEMENTS, is_self_closing_tag
+
+# HTML parser : turns markup back into HTMLobj trees, either at once or chunk by chunk
+# comments, doctypes, processing instructions and CDATA sections are dropped. texts and
+# attribute values are unescaped, the renderer escapes them again
+
+
+_MARKUP = re_compile(
+    r"""<(?:
+        !--.*?-->
+        |!\[CDATA\[.*?\]\]>
+        |[!?][^>]*>
+        |/\s*(?P<end>[A-Za-z][^\s/>]*)[^>]*>
+        |(?P<start>[A-Za-z][^\s/>]*)(?P<attrs>(?:[^>"']|"[^"]*"|'[^']*')*?)(?P<closed>/?)>
+    )""",
+    DOTALL | VERBOSE,
+)
+_ATTRIBUTE = re_compile(
+    r"""([^\s="'/>][^\s="'>]*)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?"""
+)
+# attributes that can't be given to HTMLobj as keyword arguments
+_RESERVED = frozenset(("tag", "css", "class_"))
+# no markup inside these, only script and style keep their entities as they are
+_RAW_TEXT_TAGS = frozenset(("script", "style", "textarea", "title"))
+# an opening tag closes the nearest open element among the first set, with everything
+# opened inside it, unless an element of the second set (its scope) comes first
+_LIST_SCOPE = frozenset(("ul", "ol", "menu", "table"))
+_CELL_SCOPE = frozenset(("tr", "table"))
+_IMPLIED_END = {
+    "li": (frozenset(("li",)), _LIST_SCOPE),
+    "p": (frozenset(("p",)), frozenset(("ul", "ol", "li", "dl", "table", "td", "th", "button"))),
+    "dt": (frozenset(("dt", "dd")), frozenset(("dl", "table"))),
+    "dd": (frozenset(("dt", "dd")), frozenset(("dl", "table"))),
+    "tr": (frozenset(("tr",)), frozenset(("table", "thead", "tbody", "tfoot"))),
+    "td": (frozenset(("td", "th")), _CELL_SCOPE),
+    "th": (frozenset(("td", "th")), _CELL_SCOPE),
+    "option": (frozenset(("option",)), frozenset(("select", "datalist", "optgroup"))),
+}
+
+
+def parse_inline_css(style: str) -> CSSobj:
+    "builds a CSSobj from the value of a style attribute"
+    styles = {}
+    for declaration in style.split(";"):
+        key, _, value = declaration.partition(":")
+        if key.strip():
+            styles[key.strip()] = value.strip()
+    return CSSobj(**styles)
+
+
+class _Open:
+    "an element waiting for its end tag"
+
+    __slots__ = ("tag", "attributes", "contents")
+
+    def __init__(self, tag: str, attributes: dict, contents: list) -> None:
+        self.tag = tag
+        self.attributes = attributes
+        self.contents = contents
+
+
+class Parser:
+    """an incremental parser, feed it chunks of markup and it returns the elements
+    completed at the emit level (0 being the top level) since the last call.
+    emitted elements are not kept in their parent so memory stays bounded"""
+
+    __slots__ = ("keep_whitespace", "level", "_buffer", "_pending", "_open", "_emitted")
+
+    def __init__(self, keep_whitespace: bool = False, level: int = 0) -> None:
+        self.keep_whitespace = keep_whitespace
+        self.level = level
+        self._buffer = ""
+        # text already scanned, waiting for the rest of it in the next chunks
+        self._pending: list[str] = []
+        self._open: list[_Open] = []
+        self._emitted: list[Union[HTMLobj, str]] = []
+
+    def feed(self, data: str) -> list[Union[HTMLobj, str]]:
+        self._buffer += data
+        self._consume(final=False)
+        return self._flush()
+
+    def close(self) -> list[Union[HTMLobj, str]]:
+        "parses what is left and closes every element still open"
+        self._consume(final=True)
+        while self._open:
+            self._close_top()
+        return self._flush()
+
+    def _flush(self) -> list[Union[HTMLobj, str]]:
+        emitted, self._emitted = self._emitted, []
+        return emitted
+
+    def _add(self, content: Union[HTMLobj, str]) -> None:
+        if len(self._open) == self.level:
+            self._emitted.append(content)
+        elif len(self._open) > self.level:
+            self._open[-1].contents.append(content)
+        # anything above the emit level is dropped, it is already out of the parser
+
+    def _text(self, text: str, raw: bool = False) -> None:
+        if self._pending:
+            self._pending.append(text)
+            text = "".join(self._pending)
+            self._pending.clear()
+        if text and (self.keep_whitespace or not text.isspace()):
+            self._add(unescape(text) if not raw and "&" in text else text)
+
+    def _close_top(self) -> None:
+        element = self._open.pop()
+        attributes = element.attributes
+        if not attributes:
+            node = HTMLobj(element.tag, None, None, *element.contents)
+        else:
+            class_ = attributes.pop("class", None)
+            css = None
+            for key in ("style", "styles"):  # styles, as written by the former renderer, still read
+                if key in attributes:
+                    css = parse_inline_css(attributes.pop(key))
+            if _RESERVED.isdisjoint(attributes):
+                node = HTMLobj(element.tag, css, class_, *element.contents, **attributes)
+            else:
+                node = HTMLobj(element.tag, css, class_, *element.contents)
+                node.attributes = attributes
+        self._add(node)
+
+    def _end(self, tag: str) -> None:
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i].tag == tag:
+                while len(self._open) > i:
+                    self._close_top()
+                return
+        # a stray end tag without a matching element is ignored
+
+    def _start(self, tag: str, raw_attributes: str, closed: bool) -> None:
+        implied = _IMPLIED_END.get(tag)
+        if implied:
+            closed_by, scope = implied
+            for i in range(len(self._open) - 1, -1, -1):
+                current = self._open[i].tag
+                if current in closed_by:
+                    while len(self._open) > i:
+                        self._close_top()
+                    break
+                if current in scope:
+                    break
+        attributes = {}
+        if raw_attributes and not raw_attributes.isspace():
+            for name, double, single, bare in _ATTRIBUTE.findall(raw_attributes):
+                value = double or single or bare
+                attributes[name.lower()] = unescape(value) if "&" in value else value
+        self._open.append(_Open(tag, attributes, []))
+        if closed or is_self_closing_tag(tag):
+            self._close_top()
+
+    def _consume(self, final: bool) -> None:
+        buffer, pos = self._buffer, 0
+        length = len(buffer)
+        while pos < length:
+            if self._open and self._open[-1].tag in _RAW_TEXT_TAGS:
+                # the contents of script and style elements are not markup
+                tag = self._open[-1].tag
+                end = _raw_text_end(tag).search(buffer, pos)
+                if end is None:
+                    if not final:
+                        # only what may be the start of the end tag is searched again
+                        safe = _raw_text_safe(buffer, pos, tag)
+                        self._pending.append(buffer[pos:safe])
+                        pos = safe
+                        break
+                    self._text(buffer[pos:], tag in _RAW_TEXT_ELEMENTS)
+                    pos = length
+                    break
+                self._text(buffer[pos : end.start()], tag in _RAW_TEXT_ELEMENTS)
+                self._end(tag)
+                pos = end.end()
+                continue
+            start = buffer.find("<", pos)
+            if start == -1:
+                if not final:
+                    # the text may continue in the next chunk
+                    self._pending.append(buffer[pos:])
+                    pos = length
+                    break
+                self._text(buffer[pos:])
+                pos = length
+                break
+            match = _MARKUP.match(buffer, start)
+            if match is None:
+                following = buffer[start + 1 : start + 2]
+                if not final and (not following or following.isalpha() or following in "/!?"):
+                    # most likely an unfinished tag, wait for the rest of it
+                    self._text(buffer[pos:start])
+                    pos = start
+                    break
+                # a lone "<" is just text
+                next_tag = buffer.find("<", start + 1)
+                next_tag = length if next_tag == -1 else next_tag
+                self._text(buffer[pos:next_tag])
+                pos = next_tag
+                continue
+            self._text(buffer[pos:start])
+            pos = match.end()
+            if match["start"]:
+                self._start(match["start"].lower(), match["attrs"], bool(match["closed"]))
+            elif match["end"]:
+                self._end(match["end"].lower())
+        if final and self._pending:
+            self._text("", bool(self._open) and self._open[-1].tag in _RAW_TEXT_ELEMENTS)
+        self._buffer = buffer[pos:]
+
+
+_raw_text_ends: dict[str, Any] = {}
+
+
+def _raw_text_end(tag: str) -> Any:
+    if tag not in _raw_text_ends:
+        _raw_text_ends[tag] = re_compile(rf"</{tag}\s*>", IGNORECASE)
+    return _raw_text_ends[tag]
+
+
+def _raw_text_safe(buffer: str, pos: int, tag: str) -> int:
+    "where the raw text of buffer may start to be the end tag, its length when it can't"
+    start = buffer.rfind("<", pos)
+    if start == -1:
+        return len(buffer)
+    tail, end = buffer[start:].lower(), f"</{tag}"
+    if end.startswith(tail) or (tail.startswith(end) and tail[len(end) :].isspace()):
+        return start
+    return len(buffer)
+
+
+def iter_parse(
+    source: Union[str, bytes, IO],
+    chunk_size: int = 1 << 16,
+    keep_whitespace: bool = False,
+    level: int = 0,
+) -> Iterator[Union[HTMLobj, str]]:
+    """yields the completed elements (and text) found at the given depth, a file is
+    read chunk_size characters at a time so the whole document is never in memory"""
+    parser = Parser(keep_whitespace, level)
+    if isinstance(source, bytes):
+        source = source.decode("utf-8")
+    if isinstance(source, str):
+        yield from parser.feed(source)
+    else:
+        decoder = getincrementaldecoder("utf-8")()  # a chunk may end mid character
+        while chunk := source.read(chunk_size):
+            if isinstance(chunk, bytes):
+                chunk = decoder.decode(chunk)
+            yield from parser.feed(chunk)
+        yield from parser.feed(decoder.decode(b"", final=True))
+    yield from parser.close()
+
+
+def parse(
+    source: Union[str, bytes, IO], keep_whitespace: bool = False
+) -> Union[HTMLobj, list[Union[HTMLobj, str]]]:
+    """returns the root element of the markup, or the list of top level elements and
+    texts when there isn't exactly one root element"""
+    contents = list(iter_parse(source, keep_whitespace=keep_whitespace))
+    elements = [i for i in contents if isinstance(i, HTMLobj)]
+    if len(elements) == 1 and all(isinstance(i, HTMLobj) or i.isspace() for i in contents):
+        return elements[0]
+    return contents
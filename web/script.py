@@ -0,0 +1,338 @@
+from hashlib import sha256
+from os import makedirs
+from os.path import isfile, join
+from re import DOTALL, IGNORECASE, VERBOSE, compile as re_compile
+from typing import Any, Union
+from web.html_ import HTMLobj
+from web.js import Function, Var
+
+# Script building : renders Function / Var trees without recursion into one buffer,
+# either in the layout of Function.as_script or minified (no comments nor needless
+# whitespace, short names for parameters and local variables), and bundles scripts
+# into one <script> element or a content hashed file that can be cached forever
+
+_TOKEN = re_compile(
+    r"""
+    (\s+)
+    |(//[^\n]*|/\*.*?\*/)
+    |("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+    |([\w$]+)
+    |([^\w\s$"'`/]+|/|.)
+    """,
+    DOTALL | VERBOSE,
+)
+_SPACE, _COMMENT, _STRING, _WORD, _OTHER = range(1, 6)
+_REGEX = re_compile(r"/(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/[A-Za-z]*")
+_NEXT = re_compile(r"(?:\s+|//[^\n]*|/\*.*?\*/)*(.?)", DOTALL)
+_NAME = re_compile(r"(?<![\w$])[A-Za-z_$][\w$]*")
+_DECLARATION = re_compile(r"\b(?:var|let|const)\s")
+_DECLARED = re_compile(r"\b(?:var|let|const)\s+([A-Za-z_$][\w$]*)")
+_QUOTED = re_compile(r"[\"'`/]")
+_PARAMETER = re_compile(r"\s*(?:\.\.\.\s*)?([A-Za-z_$][\w$]*)\s*(?:=|$)", DOTALL)
+_UNSAFE = re_compile(r"\b(?:eval|with)\b|\$\{")
+_SCRIPT_END = re_compile(r"</(script)", IGNORECASE)
+# a "/" after one of these starts a regular expression, not a division
+_REGEX_AFTER_CHARS = frozenset("(,=:[!&|?{};+-*%<>~^")
+_REGEX_AFTER_WORDS = frozenset(
+    ("return", "typeof", "case", "do", "else", "in", "of", "void", "yield", "await")
+    + ("delete", "throw", "new", "instanceof")
+)
+_KEYWORDS = frozenset(
+    ("do", "if", "in", "for", "let", "new", "try", "var", "case", "else", "enum", "eval")
+    + ("null", "this", "true", "void", "with", "break", "catch", "class", "const")
+    + ("false", "super", "throw", "while", "yield", "async", "await", "delete", "export")
+    + ("import", "public", "return", "static", "switch", "typeof", "default", "extends")
+    + ("finally", "package", "private", "continue", "debugger", "function", "arguments")
+    + ("interface", "protected", "implements", "instanceof", "undefined", "NaN", "of")
+)
+_DECLARATIONS = frozenset(("var", "let", "const"))
+# a "{" after one of these opens an object literal, anywhere else a block ("B")
+_OBJECT_AFTER_CHARS = frozenset("(,=:[!&|?+-*%<>~^")
+_OBJECT_AFTER_WORDS = frozenset(("return", "typeof", "case", "in", "of", "void", "yield", "await", "throw"))
+_FIRST = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_$"
+_NEXT_CHARS = _FIRST + "0123456789"
+
+
+def _short_name(index: int) -> str:
+    name = _FIRST[index % len(_FIRST)]
+    index //= len(_FIRST)
+    while index:
+        index -= 1
+        name += _NEXT_CHARS[index % len(_NEXT_CHARS)]
+        index //= len(_NEXT_CHARS)
+    return name
+
+
+def _declared(code: str) -> list[str]:
+    "the names declared by var, let and const in a statement (destructuring is left alone)"
+    if not _DECLARATION.search(code):
+        return []
+    if not _QUOTED.search(code):  # nothing to skip, the names are the words after the keyword
+        return _DECLARED.findall(code)
+    names, declaring = [], False
+    for match in _TOKEN.finditer(code):
+        kind = match.lastindex
+        if kind == _SPACE or kind == _COMMENT:
+            continue
+        if declaring and kind == _WORD and not match.group(kind)[0].isdigit():
+            names.append(match.group(kind))
+        declaring = kind == _WORD and match.group(kind) in _DECLARATIONS
+    return names
+
+
+def _parameter(argument: str) -> Union[str, None]:
+    "the name a parameter declares (`...rest`, `value = 1`), None for destructuring"
+    match = _PARAMETER.match(argument)
+    return match.group(1) if match else None
+
+
+def _opens_object(before: str) -> bool:
+    "whether a { after this token opens an object literal rather than a block"
+    if before.endswith("=>"):
+        return False  # an arrow function body
+    return before[-1:] in _OBJECT_AFTER_CHARS or before in _OBJECT_AFTER_WORDS
+
+
+def _minify(code: str, names: dict[str, str], brackets: list[str]) -> str:
+    """strips the comments and needless whitespace of a statement and renames the
+    local names. brackets is the stack of the open brackets of the function ("B" for
+    the braces of a block), kept between its statements to tell object keys from
+    variables"""
+    out: list[str] = []
+    previous = ""  # last significant token
+    space = ""  # whitespace skipped since it
+    pos, length = 0, len(code)
+    while pos < length:
+        for match in _TOKEN.finditer(code, pos):
+            kind = match.lastindex
+            text = match.group(kind)
+            if kind == _SPACE:
+                space = "\n" if space == "\n" or "\n" in text else " "
+                continue
+            if kind == _COMMENT:
+                space = space or " "
+                continue
+            if kind == _OTHER:
+                if text == "/" and (
+                    not previous
+                    or previous[-1] in _REGEX_AFTER_CHARS
+                    or previous in _REGEX_AFTER_WORDS
+                ):
+                    regex = _REGEX.match(code, match.start())
+                    if regex:
+                        text, pos = regex.group(), regex.end()
+                for i, char in enumerate(text):
+                    if char == "{":
+                        brackets.append("{" if _opens_object(text[:i] or previous) else "B")
+                    elif char in "([":
+                        brackets.append(char)
+                    elif char in ")]}" and brackets:
+                        brackets.pop()
+            elif kind == _WORD and text in names:
+                if previous[-1:] == "." and previous[-3:] != "...":
+                    pass  # a property
+                elif previous[-1:] in ("{", ",") and brackets and brackets[-1] == "{":
+                    following = _NEXT.match(code, match.end()).group(1)
+                    if following in ("}", ","):
+                        text = f"{text}:{names[text]}"  # a shorthand property
+                    elif following != ":":  # else an object key
+                        text = names[text]
+                else:
+                    text = names[text]
+            if space and out:
+                last, first = out[-1][-1], text[0]
+                if space == "\n" and last not in ";{(,[=" and first not in "})];,.=":
+                    out.append("\n")  # automatic semicolon insertion may rely on it
+                elif (last.isalnum() or last in "_$\\") and (first.isalnum() or first in "_$\\"):
+                    out.append(" ")
+                elif (last == first and last in "+-/") or (last.isdigit() and first == "."):
+                    out.append(" ")
+            out.append(text)
+            previous, space = text, ""
+            if pos > match.start():
+                break  # a regular expression literal, the tokens start again after it
+        else:
+            pos = length
+    return "".join(out)
+
+
+class Script:
+    """an ordered bundle of Function, Var and plain javascript statements rendered as
+    one script. minify drops comments and whitespace, mangle (with minify) gives
+    parameters and local variables short names; it is skipped for scripts using
+    eval, with or template literals with ${...} whose code can't be renamed safely"""
+
+    __slots__ = ("items",)
+
+    def __init__(self, *items: Union[Function, Var, str]) -> None:
+        self.items = [i for i in items if i is not None]
+
+    def add(self, item: Union[Function, Var, str]) -> None:
+        self.items.append(item)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def _used_names(self) -> Union[set[str], None]:
+        "every name of the script (strings included), None when it can't be mangled"
+        used, seen = set(), set()
+        stack = list(self.items)
+        while stack:
+            item = stack.pop()
+            if isinstance(item, Function):
+                used.add(item.name)
+                stack.extend(item.args_demanded)
+                stack.extend(i for i in item.contents if i is not None)
+                continue
+            code = item if type(item) is str else str(item)
+            if code in seen:
+                continue
+            seen.add(code)
+            if _UNSAFE.search(code):
+                return None
+            used.update(_NAME.findall(code))
+        return used
+
+    def render(self, minify: bool = False, mangle: bool = True) -> str:
+        out: list[str] = []
+        if minify:
+            self._render_minified(out, self._used_names() if mangle else None)
+        else:
+            self._render_pretty(out)
+        return "".join(out)
+
+    def _render_pretty(self, out: list[str]) -> None:
+        """the layout of Function.as_script, statements one per line. a function holding
+        no other function is written in one piece, only the nested ones use the stack"""
+        stack = [(iter(self.items), "")]  # (items left, end of the function)
+        first = True
+        while stack:
+            for item in stack[-1][0]:
+                if item is None:
+                    continue
+                if not first:
+                    out.append("\n")
+                first = False
+                if type(item) is str:
+                    out.append(item)
+                    continue
+                if not isinstance(item, Function):
+                    out.append(str(item))
+                    continue
+                head = f"{'async ' if item.async_ else ''}function {item.name}({', '.join(item.args_demanded)}) {{"
+                lines = []
+                for i in item.contents:
+                    if type(i) is str:
+                        lines.append(i)
+                    elif isinstance(i, Function):
+                        break
+                    elif i is not None:
+                        lines.append(str(i))
+                else:
+                    body = "\n".join(lines)
+                    out.append(f"{head}\n{body}\n\n}}" if lines else f"{head}\n}}")
+                    continue
+                out.append(head + "\n")
+                stack.append((iter(item.contents), "\n\n}"))
+                first = True
+                break
+            else:
+                out.append(stack.pop()[1])
+                first = False
+
+    def _render_minified(self, out: list[str], used: Union[set[str], None]) -> None:
+        # every function has its scope : the short names of the enclosing ones plus its
+        # own locals, numbered after the ones of its parents so they never shadow them.
+        # generated scripts repeat the same statements in functions with the same locals,
+        # those are minified once : (statement, scope, open brackets) -> (text, brackets)
+        cache: dict[tuple, tuple[str, tuple]] = {}
+        stack = [(iter(self.items), {}, 0, [], ())]  # (items left, names, counter, brackets, scope)
+        while stack:
+            items, names, counter, brackets, scope = stack[-1]
+            for item in items:
+                if item is None:
+                    continue
+                if isinstance(item, Function):
+                    names, counter = self._scope(item, names, counter, used)
+                    arguments = ",".join(_minify(i, names, []) for i in item.args_demanded)
+                    text = f"{'async ' if item.async_ else ''}function {item.name}({arguments}){{"
+                    stack.append((iter(item.contents), names, counter, [], tuple(names.items())))
+                else:
+                    code = item if type(item) is str else str(item)
+                    key = (code, scope, tuple(brackets))
+                    if key in cache:
+                        text, opened = cache[key]
+                        brackets[:] = opened
+                    else:
+                        text = _minify(code, names, brackets)
+                        cache[key] = text, tuple(brackets)
+                    if not text:
+                        continue
+                if out and out[-1][-1] not in ";{," and text[0] != "}":
+                    out.append("\n")
+                out.append(text)
+                if isinstance(item, Function):
+                    break
+            else:
+                stack.pop()
+                if stack:  # the end of a function
+                    out.append("}")
+
+    @staticmethod
+    def _scope(
+        function: Function, names: dict[str, str], counter: int, used: Union[set[str], None]
+    ) -> tuple[dict[str, str], int]:
+        "the short names seen in a function, those of its parents plus its own locals"
+        if used is None:
+            return names, counter
+        names = dict(names)
+        locals_ = [_parameter(i) for i in function.args_demanded]
+        for i in function.contents:
+            if isinstance(i, Var):
+                if i.declaration != "global":
+                    locals_.append(i.var_name)
+            elif i is not None and not isinstance(i, Function):
+                locals_ += _declared(i if type(i) is str else str(i))
+        for name in locals_:
+            if name is None or name in names:  # an inner local reuses the name it shadows
+                continue
+            while _short_name(counter) in used or _short_name(counter) in _KEYWORDS:
+                counter += 1
+            names[name] = _short_name(counter)
+            counter += 1
+        return names, counter
+
+    def content_hash(self, minify: bool = True) -> str:
+        return sha256(self.render(minify).encode("utf-8")).hexdigest()
+
+    def to_html(self, minify: bool = True) -> HTMLobj:
+        "an inline <script> element holding the whole bundle"
+        return HTMLobj("script", None, None, _SCRIPT_END.sub(r"<\\/\1", self.render(minify)))
+
+    def export(
+        self, out_dir: str, name: str = "bundle", minify: bool = True, url_prefix: str = ""
+    ) -> HTMLobj:
+        """writes the bundle to out_dir as name.<content hash>.js (kept when it already
+        exists) and returns the <script src=...> element loading it"""
+        code = self.render(minify).encode("utf-8")
+        filename = f"{name}.{sha256(code).hexdigest()[:16]}.js"
+        path = join(out_dir, filename)
+        if not isfile(path):
+            makedirs(out_dir, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(code)
+        return HTMLobj("script", None, None, src=f"{url_prefix}{filename}")
+
+
+def bundle(*scripts: Union[Script, Function, Var, str]) -> Script:
+    "merges scripts (or loose items) into one Script, in order"
+    items: list[Any] = []
+    for script in scripts:
+        if isinstance(script, Script):
+            items += script.items
+        else:
+            items.append(script)
+    return Script(*items)
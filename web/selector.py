@@ -0,0 +1,386 @@
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from re import VERBOSE, compile as re_compile
+from typing import Any, Iterator
+
+# CSS selector support for HTMLobj trees : tag, *, .class, #id, [attr], [attr=value]
+# joined by the descendant (space) and child (>) combinators, comma separated groups
+
+
+_TOKEN = re_compile(
+    r"""\s*(?:
+        (?P<comma>,)
+        |(?P<child>>)
+        |(?P<tag>\*|[A-Za-z][\w-]*)
+        |\.(?P<class_>[\w-]+)
+        |\#(?P<id>[\w-]+)
+        |\[\s*(?P<attr>[\w:-]+)\s*(?:=\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[^\]\s]+))\s*)?\]
+    )""",
+    VERBOSE,
+)
+
+
+class Compound:
+    "a single compound selector like `div.card#main[data-x=1]`"
+
+    __slots__ = ("tag", "classes", "id", "attributes")
+
+    def __init__(self) -> None:
+        self.tag: str | None = None
+        self.classes: list[str] = []
+        self.id: str | None = None
+        self.attributes: list[tuple[str, str | None]] = []
+
+    def matches(self, node: Any) -> bool:
+        if self.tag is not None and node.tag != self.tag:
+            return False
+        if self.classes:
+            classes = str(node.class_).split() if node.class_ else ()
+            if any(i not in classes for i in self.classes):
+                return False
+        attributes = node.attributes or {}
+        if self.id is not None and str(attributes.get("id")) != self.id:
+            return False
+        for name, value in self.attributes:
+            if name == "class":
+                current = node.class_
+            elif name in attributes:
+                current = attributes[name]
+            else:
+                return False
+            if current is None or (value is not None and str(current) != value):
+                return False
+        return True
+
+
+# a complex selector is stored right to left : [(compound, combinator to its left), ...]
+Complex = tuple[tuple[Compound, str | None], ...]
+
+
+@lru_cache(maxsize=256)
+def parse_selector(selector: str) -> tuple[Complex, ...]:
+    "parses a selector group into complex selectors, raises ValueError on bad syntax"
+    groups: list[Complex] = []
+    parts: list[tuple[Compound, str | None]] = []
+    compound, combinator, pos = None, None, 0
+    selector = selector.strip()
+    while pos < len(selector):
+        match = _TOKEN.match(selector, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Invalid selector {selector!r} at position {pos}")
+        spaced = selector[pos].isspace()
+        pos = match.end()
+        kind = match.lastgroup
+        if kind in ("dq", "sq", "bare"):
+            kind = "attr"
+        if kind in ("comma", "child"):
+            if compound is None:
+                raise ValueError(f"Invalid selector {selector!r}: dangling {match[kind]!r}")
+            parts.append((compound, combinator))
+            compound, combinator = None, None
+            if kind == "comma":
+                groups.append(tuple(reversed(parts)))
+                parts = []
+            else:
+                combinator = ">"
+            continue
+        if compound is not None and spaced:
+            # whitespace between two compounds is the descendant combinator
+            parts.append((compound, combinator))
+            compound, combinator = None, " "
+        if compound is None:
+            if combinator is None and parts:
+                combinator = " "
+            compound = Compound()
+        if kind == "tag":
+            if compound.tag is not None or compound.classes or compound.id or compound.attributes:
+                raise ValueError(f"Invalid selector {selector!r}: misplaced tag name")
+            compound.tag = None if match["tag"] == "*" else match["tag"]
+        elif kind == "class_":
+            compound.classes.append(match["class_"])
+        elif kind == "id":
+            compound.id = match["id"]
+        else:
+            value = match["dq"] if match["dq"] is not None else match["sq"]
+            value = value if value is not None else match["bare"]
+            compound.attributes.append((match["attr"], value))
+    if compound is None:
+        raise ValueError(f"Invalid selector {selector!r}: unexpected end")
+    parts.append((compound, combinator))
+    groups.append(tuple(reversed(parts)))
+    return tuple(groups)
+
+
+class TreeIndex:
+    """maps tags, classes, ids and attribute names to the nodes holding them, every list
+    kept in document order. nodes are placed by labels, spaced preorder numbers, so
+    HTMLobj inserts and removes subtrees in place when the tree changes. a node can
+    only be at one place of the tree, share_subtrees trees raise ValueError"""
+
+    __slots__ = (
+        "nodes",
+        "span",
+        "parents",
+        "tags",
+        "classes",
+        "ids",
+        "attributes",
+        "firsts",
+        "__weakref__",
+    )
+
+    def __init__(self, root: Any, node_type: type) -> None:
+        # nodes are keyed by id() so the index never relies on their __eq__ / __hash__
+        self.nodes: list = []
+        self.span: dict[int, tuple[int, int]] = {}  # label, label of the last descendant
+        self.parents: dict = {}
+        self.tags: dict[str, list] = {}
+        self.classes: dict[str, list] = {}
+        self.ids: dict[str, list] = {}
+        self.attributes: dict[str, list] = {}
+        self.firsts: dict = {}  # (id(parent), tag) -> first child with that tag
+        self.nodes = self._walk(root, node_type, 0, _GAP)
+        for node in self.nodes:
+            self._register(node, append=True)
+
+    def _walk(self, root: Any, node_type: type, low: int, step: int) -> list:
+        "the subtree in preorder, labelled low + step, low + 2 * step..."
+        nodes, span, parents, firsts = [], self.span, self.parents, self.firsts
+        stack: list = [root]
+        closing: list = []
+        while stack:
+            node = stack.pop()
+            if node is None:
+                # every subtree ends with a None marker to record where it stops
+                opened = id(closing.pop())
+                span[opened] = (span[opened][0], low + len(nodes) * step)
+                continue
+            if id(node) in span:
+                raise ValueError(
+                    f"a <{node.tag}> node is at several places of the tree (share_subtrees?), "
+                    "it can't be indexed"
+                )
+            nodes.append(node)
+            label = low + len(nodes) * step
+            span[id(node)] = (label, label)
+            children = [i for i in node.contents or () if isinstance(i, node_type)]
+            closing.append(node)
+            stack.append(None)
+            for child in reversed(children):
+                parents[id(child)] = node
+                stack.append(child)
+            for child in children:
+                firsts.setdefault((id(node), child.tag), child)
+        return nodes
+
+    def _keys(self, node: Any) -> Iterator[tuple[dict, str]]:
+        "the lists of the index the node is in"
+        yield self.tags, node.tag
+        if node.class_:
+            for i in str(node.class_).split():
+                yield self.classes, i
+        attributes = node.attributes or {}
+        for i in attributes:
+            yield self.attributes, i
+        if "id" in attributes:
+            yield self.ids, str(attributes["id"])
+
+    def _register(self, node: Any, append: bool = False) -> None:
+        label = self.span[id(node)][0]
+        for table, key in self._keys(node):
+            items = table.setdefault(key, [])
+            if append or not items or self.span[id(items[-1])][0] < label:
+                items.append(node)
+            else:
+                items.insert(bisect_right(items, label, key=self.position), node)
+
+    def _unregister(self, node: Any) -> None:
+        label = self.span[id(node)][0]
+        for table, key in self._keys(node):
+            items = table.get(key)
+            if not items:
+                continue
+            i = bisect_left(items, label, key=self.position)
+            if i < len(items) and items[i] is node:
+                del items[i]
+                if not items:
+                    del table[key]
+
+    def discard(self, node: Any) -> None:
+        "takes the node out of the lists before its tag, class or attributes change"
+        self._unregister(node)
+
+    def refresh(self, node: Any, old_tag: str = None) -> None:
+        "puts the node back in the lists once they changed, after discard"
+        self._register(node)
+        parent = self.parents.get(id(node))
+        if parent is not None and old_tag is not None and old_tag != node.tag:
+            self._first_child_again(parent, old_tag)
+            self._first_child_again(parent, node.tag)
+
+    def insert(self, parent: Any, child: Any, node_type: type) -> None:
+        "indexes the subtree of child, just placed in the contents of parent"
+        previous = None
+        for i in parent.contents:
+            if i is child:
+                break
+            if isinstance(i, node_type) and id(i) in self.span:
+                previous = i
+        low = self.span[id(previous)][1] if previous is not None else self.span[id(parent)][0]
+        at = bisect_right(self.nodes, low, key=self.position)
+        size = _count(child, node_type)
+        high = self.position(self.nodes[at]) if at < len(self.nodes) else low + (size + 1) * _GAP
+        if high - low <= size:
+            self._relabel()
+            return self.insert(parent, child, node_type)
+        self.parents[id(child)] = parent
+        try:
+            # packed at the start of the room, add() appends the next ones after them
+            nodes = self._walk(child, node_type, low, max(1, (high - low) // (32 * size + 32)))
+        except ValueError:
+            self.parents.pop(id(child), None)
+            raise
+        self.nodes[at:at] = nodes
+        for node in nodes:
+            self._register(node)
+        first = self.first_child(parent, child.tag)
+        if first is None or self.position(first) > self.position(child):
+            self.firsts[id(parent), child.tag] = child
+        # the ancestors whose subtree ended where it went now end with it
+        end, node = self.span[id(child)][1], parent
+        while node is not None and self.span[id(node)][1] == low:
+            self.span[id(node)] = (self.span[id(node)][0], end)
+            node = self.parents.get(id(node))
+
+    def remove(self, parent: Any, child: Any) -> None:
+        "drops the subtree of child, just taken out of the contents of parent"
+        if id(child) not in self.span or self.parents.get(id(child)) is not parent:
+            return
+        start, end = self.span[id(child)]
+        low = bisect_left(self.nodes, start, key=self.position)
+        high = bisect_right(self.nodes, end, key=self.position, lo=low)
+        nodes = self.nodes[low:high]
+        for node in nodes:
+            self._unregister(node)
+        del self.nodes[low:high]
+        for node in nodes:
+            del self.span[id(node)]
+            self.parents.pop(id(node), None)
+            for i in node.contents or ():
+                self.firsts.pop((id(node), getattr(i, "tag", None)), None)
+        before = self.position(self.nodes[low - 1])
+        node = parent
+        while node is not None and self.span[id(node)][1] == end:
+            self.span[id(node)] = (self.span[id(node)][0], before)
+            node = self.parents.get(id(node))
+        if self.firsts.get((id(parent), child.tag)) is child:
+            self._first_child_again(parent, child.tag)
+
+    def _first_child_again(self, parent: Any, tag: str) -> None:
+        "looks for the first child with the tag again, once the one known left"
+        self.firsts.pop((id(parent), tag), None)
+        for i in parent.contents or ():
+            if id(i) in self.span and self.parents.get(id(i)) is parent and i.tag == tag:
+                self.firsts[id(parent), tag] = i
+                return
+
+    def _relabel(self) -> None:
+        "spaces the labels again once an insert found no room left"
+        labels = {self.span[id(node)][0]: (i + 1) * _GAP for i, node in enumerate(self.nodes)}
+        for key, (start, end) in self.span.items():
+            self.span[key] = (labels[start], labels[end])
+
+    def __contains__(self, node: Any) -> bool:
+        return id(node) in self.span
+
+    def first_child(self, parent: Any, tag: str) -> Any:
+        return self.firsts.get((id(parent), tag))
+
+    def position(self, node: Any) -> int:
+        return self.span[id(node)][0]
+
+    def _candidates(self, compound: Compound) -> list:
+        "the shortest indexed list that any node matching the compound must be in"
+        options = []
+        if compound.id is not None:
+            options.append(self.ids.get(compound.id, []))
+        if compound.tag is not None:
+            options.append(self.tags.get(compound.tag, []))
+        for i in compound.classes:
+            options.append(self.classes.get(i, []))
+        for name, _ in compound.attributes:
+            if name == "class":
+                continue
+            options.append(self.attributes.get(name, []))
+        return min(options, key=len) if options else self.nodes
+
+    def _matches_left(self, node: Any, parts: Complex, i: int) -> bool:
+        "checks the compounds left of parts[i - 1] against the ancestors of node"
+        if i == len(parts):
+            return True
+        compound, _ = parts[i]
+        combinator = parts[i - 1][1]
+        parent = self.parents.get(id(node))
+        if combinator == ">":
+            return (
+                parent is not None
+                and compound.matches(parent)
+                and self._matches_left(parent, parts, i + 1)
+            )
+        while parent is not None:
+            if compound.matches(parent) and self._matches_left(parent, parts, i + 1):
+                return True
+            parent = self.parents.get(id(parent))
+        return False
+
+    def iter_select(self, scope: Any, parts: Complex) -> Iterator:
+        "yields the descendants of scope matching a complex selector, in document order"
+        start, end = self.span[id(scope)]
+        candidates = self._candidates(parts[0][0])
+        position = self.position
+        low = bisect_right(candidates, start, key=position)
+        high = bisect_right(candidates, end, key=position, lo=low)
+        compound = parts[0][0]
+        for i in range(low, high):
+            node = candidates[i]
+            if compound.matches(node) and self._matches_left(node, parts, 1):
+                yield node
+
+    def select(self, scope: Any, selector: str) -> list:
+        groups = parse_selector(selector)
+        if len(groups) == 1:
+            return list(self.iter_select(scope, groups[0]))
+        found = {}
+        for parts in groups:
+            for node in self.iter_select(scope, parts):
+                found[id(node)] = node
+        return sorted(found.values(), key=self.position)
+
+    def select_one(self, scope: Any, selector: str) -> Any:
+        first = None
+        for parts in parse_selector(selector):
+            node = next(self.iter_select(scope, parts), None)
+            if node is not None and (first is None or self.position(node) < self.position(first)):
+                first = node
+        return first
+
+    def in_scope(self, scope: Any, tag: str) -> list:
+        "the nodes with the given tag below scope, in document order"
+        start, end = self.span[id(scope)]
+        candidates = self.tags.get(tag, [])
+        low = bisect_right(candidates, start, key=self.position)
+        return candidates[low : bisect_right(candidates, end, key=self.position, lo=low)]
+
+
+# the room between the labels of two nodes, hundreds of appends fit at the same place
+# before the labels are spaced again
+_GAP = 1 << 32
+
+
+def _count(root: Any, node_type: type) -> int:
+    total, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        total += 1
+        stack.extend(i for i in node.contents or () if isinstance(i, node_type))
+    return total
@@ -0,0 +1,308 @@
+import asyncio
+import inspect
+import sys
+from http import HTTPStatus
+from io import BytesIO
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+from urllib.parse import unquote
+from web.html_ import HTMLobj
+from web.markup import escape
+
+# HTTP serving : ASGI and WSGI applications answering with the page a handler returns,
+# streamed in chunks. the document up to the end of its <head> is sent first so the
+# browser fetches the stylesheets and scripts while the body renders, and the ETag
+# made from the tree lets a matching If-None-Match get a 304 without any rendering.
+# hashing a tree costs about as much as rendering it, so a page only gets an ETag when
+# its hash is already cached : the handler called tree_etag on it (once, for a page
+# served many times) or the page was hashed before and hasn't changed since
+
+_DOCTYPE = "<!DOCTYPE html>"
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: str
+    headers: dict[str, str]  # lower case names
+
+
+Handler = Callable[[Request], Any]  # returns a HTMLobj or a (status, HTMLobj) pair
+
+
+def tree_etag(tree: HTMLobj) -> str:
+    """a strong ETag made of the content hash of the tree, so the page doesn't have to
+    be rendered to know whether it changed. the hash stays cached until a node changes"""
+    return f'"{tree.content_hash()}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    "If-None-Match is a * or a list of tags, weak ones compare equal too"
+    if if_none_match.strip() == "*":
+        return True
+    return any(i.strip().removeprefix("W/") == etag for i in if_none_match.split(","))
+
+
+def iter_page(tree: HTMLobj, buffer_size: int = 1 << 14) -> Iterator[bytes]:
+    """the page as utf-8 chunks of about buffer_size characters, a <html> document starts
+    with its doctype and its first chunk always ends with the </head>"""
+    head = None
+    if tree.tag == "html":
+        head = next(
+            (i for i in tree.contents or () if isinstance(i, HTMLobj) and i.tag == "head"), None
+        )
+    if head is None:
+        pieces: Iterable[str] = tree.iter_render()
+        if tree.tag == "html":
+            yield _DOCTYPE.encode("utf-8")
+    else:
+        start, end = tree.__tag__()
+        contents = [i for i in tree.contents if i is not None]
+        split = next(index for index, i in enumerate(contents) if i is head) + 1
+        yield "".join(
+            [_DOCTYPE, start, *(_render(i) for i in contents[:split])]
+        ).encode("utf-8")
+        pieces = _chain(contents[split:], end)
+    batch: list[str] = []
+    size = 0
+    for piece in pieces:
+        batch.append(piece)
+        size += len(piece)
+        if size >= buffer_size:
+            yield "".join(batch).encode("utf-8")
+            batch, size = [], 0
+    if batch:
+        yield "".join(batch).encode("utf-8")
+
+
+def _render(content: Any) -> str:
+    return str(content) if isinstance(content, HTMLobj) else escape(content)
+
+
+def _chain(contents: list, end: str) -> Iterator[str]:
+    for content in contents:
+        if isinstance(content, HTMLobj):
+            yield from content.iter_render()
+        else:
+            yield escape(content)
+    yield end
+
+
+def _respond(
+    request: Request, result: Any, etag: bool, buffer_size: int
+) -> tuple[int, list[tuple[str, str]], Iterator[bytes]]:
+    "the status, headers and body chunks answering request with what the handler returned"
+    status, tree = result if isinstance(result, tuple) else (200, result)
+    headers = [("content-type", "text/html; charset=utf-8")]
+    if etag and status == 200 and tree._hash is not None:  # never hash before the first byte
+        tag = tree_etag(tree)
+        headers.append(("etag", tag))
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _matches(if_none_match, tag):
+            return 304, [("etag", tag)], iter(())
+    if request.method == "HEAD":
+        return status, headers, iter(())
+    return status, headers, iter_page(tree, buffer_size)
+
+
+def asgi_app(handler: Handler, etag: bool = True, buffer_size: int = 1 << 14) -> Callable:
+    """an ASGI application serving the pages of handler, which may be a coroutine
+    function. the body is sent chunk by chunk, giving the event loop back in between
+    so a large page doesn't hold the other requests"""
+
+    async def app(scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            raise ValueError(f"unsupported ASGI scope {scope['type']!r}")
+        request = Request(
+            scope["method"],
+            scope["path"],
+            scope.get("query_string", b"").decode("latin-1"),
+            {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]},
+        )
+        result = handler(request)
+        if inspect.isawaitable(result):
+            result = await result
+        status, headers, chunks = _respond(request, result, etag, buffer_size)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+            }
+        )
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await asyncio.sleep(0)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    return app
+
+
+def _status_line(status: int) -> str:
+    "200 -> 200 OK, a code http doesn't know goes without a reason phrase"
+    try:
+        return f"{status} {HTTPStatus(status).phrase}"
+    except ValueError:
+        return str(status)
+
+
+def wsgi_app(handler: Handler, etag: bool = True, buffer_size: int = 1 << 14) -> Callable:
+    """a WSGI application serving the pages of handler, the body is returned as an
+    iterator of chunks the server writes as they are rendered"""
+
+    def app(environ: dict, start_response: Callable) -> Iterator[bytes]:
+        request = Request(
+            environ["REQUEST_METHOD"],
+            # PEP 3333 gives the (already unquoted) path as latin-1 decoded bytes
+            environ.get("PATH_INFO", "").encode("latin-1").decode("utf-8", "replace"),
+            environ.get("QUERY_STRING", ""),
+            {
+                name[5:].replace("_", "-").lower(): value
+                for name, value in environ.items()
+                if name.startswith("HTTP_")
+            },
+        )
+        status, headers, chunks = _respond(request, handler(request), etag, buffer_size)
+        start_response(_status_line(status), headers)
+        return chunks
+
+    return app
+
+
+class Response(NamedTuple):
+    status: int
+    headers: dict[str, str]
+    chunks: list[bytes]
+    first_byte: float  # seconds until the first body chunk, or the end without a body
+    seconds: float
+
+    @property
+    def body(self) -> bytes:
+        return b"".join(self.chunks)
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8")
+
+
+class TestClient:
+    """calls an ASGI or WSGI application in this process, without sockets, and
+    records the chunks of the response with the time they took to come"""
+
+    __test__ = False  # not a test class for pytest
+    __slots__ = ("app", "asgi")
+
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+        self.asgi = inspect.iscoroutinefunction(app) or inspect.iscoroutinefunction(
+            getattr(app, "__call__", None)
+        )
+
+    def get(self, path: str, headers: dict[str, str] = None) -> Response:
+        return self.request("GET", path, headers)
+
+    def request(self, method: str, path: str, headers: dict[str, str] = None) -> Response:
+        if self.asgi:
+            return asyncio.run(self.request_async(method, path, headers))
+        return self._wsgi(method, path, headers or {})
+
+    async def request_async(
+        self, method: str, path: str, headers: dict[str, str] = None
+    ) -> Response:
+        "the ASGI request as a coroutine, to run many of them at once on one loop"
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": unquote(path),
+            "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"),
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in (headers or {}).items()
+            ],
+        }
+        start = perf_counter()
+        # the requests gathered together all start before the first one is answered
+        await asyncio.sleep(0)
+        first_byte = None
+        status, response_headers, chunks = 0, {}, []
+
+        async def receive() -> dict:
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: dict) -> None:
+            nonlocal status, response_headers, first_byte
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = {
+                    name.decode("latin-1"): value.decode("latin-1")
+                    for name, value in message["headers"]
+                }
+            elif message["type"] == "http.response.body":
+                if message.get("body"):
+                    chunks.append(message["body"])
+                    if first_byte is None:
+                        first_byte = perf_counter() - start
+
+        await self.app(scope, receive, send)
+        seconds = perf_counter() - start
+        return Response(status, response_headers, chunks, first_byte or seconds, seconds)
+
+    def _wsgi(self, method: str, path: str, headers: dict[str, str]) -> Response:
+        path, _, query = path.partition("?")
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": unquote(path).encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "SCRIPT_NAME": "",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": False,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            name = name.upper().replace("-", "_")
+            # PEP 3333 gives these two without the HTTP_ prefix
+            environ[name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"] = value
+        started: list = []
+        start = perf_counter()
+        first_byte = None
+        chunks = []
+
+        def start_response(status: str, response_headers: list, exc_info: Any = None) -> Callable:
+            started[:] = status, response_headers
+            return chunks.append  # the write() of PEP 3333
+
+        body = self.app(environ, start_response)
+        try:
+            for chunk in body:
+                if chunk:
+                    chunks.append(chunk)
+                    if first_byte is None:
+                        first_byte = perf_counter() - start
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+        seconds = perf_counter() - start
+        status, response_headers = started
+        return Response(
+            int(status.split()[0]), dict(response_headers), chunks, first_byte or seconds, seconds
+        )
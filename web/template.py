@@ -0,0 +1,122 @@
+from re import IGNORECASE, compile as re_compile
+from typing import Any, Iterator
+from web.css import CSSobj
+from web.html_ import HTMLobj, _RAW_TEXT_ELEMENTS
+from web.markup import escape_attribute
+
+# Compiled templates : the static markup of a tree is rendered once, rendering a
+# page afterwards only joins the precomputed segments with the slot values
+
+_MARKER = "\x00slot:{}\x00"
+_MARKERS = re_compile("\x00slot:([^\x00]*)\x00")
+# what would end a script or a style early
+_RAW_TEXT_END = re_compile("</(?=script|style)", IGNORECASE)
+
+
+class Slot:
+    """a named placeholder, put it in the contents, an attribute or a style of a
+    HTMLobj tree before compiling it into a Template"""
+
+    __slots__ = ("name", "default", "safe")
+
+    def __init__(self, name: str, default: Any = ..., safe: bool = False) -> None:
+        # safe values are inserted as they are, the others get html escaped
+        if "\x00" in name:
+            raise ValueError("Slot name could not contain a null character")
+        self.name = name
+        self.default = default
+        self.safe = safe
+
+    def __str__(self) -> str:
+        return _MARKER.format(self.name)
+
+    def __repr__(self) -> str:
+        return f"<Slot {self.name}>"
+
+
+class Template:
+    "a HTMLobj tree frozen into constant markup segments and slots"
+
+    __slots__ = ("segments", "holes", "slots")
+
+    def __init__(self, tree: HTMLobj, pretty: bool = False, indent: str = "  ") -> None:
+        self.slots, raw = _collect_slots(tree)
+        parts = _MARKERS.split("".join(tree.iter_render(pretty, indent)))
+        # the split alternates constant markup and slot names : even, odd, even...
+        self.segments = parts
+        # (segment index, name, in a script or a style)
+        self.holes = tuple((i, parts[i], False) for i in range(1, len(parts), 2))
+        for _, name, _ in self.holes:
+            if name not in self.slots:
+                raise ValueError(f"Slot {name!r} is not reachable from the template tree")
+        if len(raw) == len(self.holes):
+            self.holes = tuple((i, name, in_raw) for (i, name, _), in_raw in zip(self.holes, raw))
+        elif any(raw):
+            raise ValueError("the slots of the scripts and styles could not be located")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.slots)
+
+    def render(self, **values: Any) -> str:
+        "returns the page with the given slot values, missing ones fall back to their defaults"
+        segments = self.segments.copy()
+        rendered = {}
+        for i, name, raw in self.holes:
+            if (name, raw) not in rendered:
+                rendered[name, raw] = self._value(name, values, raw)
+            segments[i] = rendered[name, raw]
+        return "".join(segments)
+
+    def iter_render(self, **values: Any) -> Iterator[str]:
+        "yields the page chunk by chunk, same as render"
+        rendered = {}
+        holes = iter(self.holes)
+        for i, segment in enumerate(self.segments):
+            if not i % 2:
+                yield segment
+                continue
+            raw = next(holes)[2]
+            if (segment, raw) not in rendered:
+                rendered[segment, raw] = self._value(segment, values, raw)
+            yield rendered[segment, raw]
+
+    def _value(self, name: str, values: dict, raw: bool = False) -> str:
+        slot = self.slots[name]
+        value = values.get(name, slot.default)
+        if value is ...:
+            raise KeyError(f"No value given for the slot {name!r}")
+        if value is None:
+            return ""
+        if slot.safe or isinstance(value, HTMLobj):
+            return str(value)
+        if raw:
+            # script and style text isn't html, only an end tag inside could break out
+            return _RAW_TEXT_END.sub("<\\/", str(value))
+        # quotes are escaped too as the slot may be an attribute value, Markup is kept
+        return escape_attribute(value)
+
+
+def _collect_slots(tree: HTMLobj) -> tuple[dict[str, Slot], list[bool]]:
+    """the slots by name, and for each place a slot is rendered at, in the order of the
+    markup, whether it is the text of a script or a style"""
+    slots: dict[str, Slot] = {}
+    raw: list[bool] = []
+    stack: list[Any] = [(tree, False)]
+    while stack:
+        node, in_raw = stack.pop()
+        if isinstance(node, Slot):
+            slots.setdefault(node.name, node)
+            raw.append(in_raw)
+            continue
+        # the same order as HTMLobj.__tag__ : styles, class then attributes
+        values = []
+        if isinstance(node.css, CSSobj):
+            values.extend((node.css.styles or {}).values())
+        values.extend((node.class_, *(node.attributes or {}).values()))
+        for i in values:
+            if isinstance(i, Slot):
+                slots.setdefault(i.name, i)
+                raw.append(False)
+        in_raw = node.tag in _RAW_TEXT_ELEMENTS
+        stack.extend((i, in_raw) for i in reversed(node.contents or ()) if isinstance(i, (Slot, HTMLobj)))
+    return slots, raw